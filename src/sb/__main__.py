@@ -1,18 +1,29 @@
 from pathlib import Path
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import get_args
 import json
-from functools import cache
+import queue
+import threading
 
 import click
+from qbittorrentapi import APIError
 from qbittorrentapi.torrents import TorrentStatusesT
 
-from sb.config import Config
+from sb.config import ClientConfig, Config
+from sb.concurrency import map_bounded
+from sb.create import TorrentVersion, create_torrent, torrent_versions
 from sb.torrent import Torrent
+from sb.cache import ExportCache
+from sb.verify import data_verified, sample_pieces, verify_torrent
 from sb.client import (
+    ChunkResult,
     QBittorrentClient,
-    FailedAddException,
+    TorrentRecord,
+    TorrentUpload,
     SBTorrentStatus,
     sb_torrent_statuses,
+    torrent_hashes,
 )
 
 
@@ -43,6 +54,20 @@ def sb():
     default=False,
     help="Delete torrent file after successfully adding or being skipped due to already existing by all clients",
 )
+@click.option(
+    "--verified-data",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+    default=None,
+    help="Directory the torrents' data is saved in locally. Torrents whose data passes local verification (or passed a previous one and is unchanged since) are added without a recheck. Others are rechecked as usual.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of clients to work on at once",
+)
 @click.option(
     "--dry-run", is_flag=True, help="Show what would be done without making changes"
 )
@@ -51,6 +76,8 @@ def add(
     torrent: tuple[Path],
     category: str | None,
     delete_after: bool,
+    verified_data: Path | None,
+    jobs: int,
     dry_run: bool,
 ):
     """
@@ -58,51 +85,88 @@ def add(
     TORRENT files may be provided.
     """
     config = Config.load_from_file()
+    client_configs = {
+        name: get_client_config(config, name) for name in client.split(",")
+    }
 
     deleteable: dict[Path, bool] = {path: True for path in torrent}
 
-    for client_name in client.split(","):
-        client_config = get_client_config(config, client_name)
-        with QBittorrentClient.from_config(client_config) as qb_client:
-            click.echo(f"Client '{client_name}'", err=True)
+    # Hash every file once, up front, and reuse the results for every client
+    try:
+        torrents = dict(zip(torrent, Torrent.from_files(torrent)))
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    verified: dict[Path, bool] = {}
+    verify_lock = threading.Lock()
+
+    def skip_checking(torrent_path: Path, output: Output) -> bool:
+        if verified_data is None:
+            return False
+        # Clients share the results, and verify one torrent at a time
+        with verify_lock:
+            if torrent_path not in verified:
+                t = torrents[torrent_path]
+                verified[torrent_path] = verify_locally(t, verified_data, output)
+                # Each open torrent holds a file descriptor, so only keep what it read
+                t.close()
+            return verified[torrent_path]
+
+    def add_to_client(client_name: str, output: Output):
+        with QBittorrentClient.from_config(client_configs[client_name]) as qb_client:
+            output.echo(f"Client '{client_name}'")
 
             existing_torrents = qb_client.list_torrents()
-            existing_hashes = {t.hash for t in existing_torrents}
+            existing_hashes = {h for t in existing_torrents for h in torrent_hashes(t)}
             recheck_hashes: set[str] = set()
 
+            existing = {
+                torrent_path
+                for torrent_path in torrent
+                if any(h.hex in existing_hashes for h in torrents[torrent_path].hashes)
+            }
+            uploads: dict[Path, TorrentUpload] = {}
             for torrent_path in torrent:
-                click.echo(
-                    f"\tAdding torrent {torrent_path}",
-                    err=True,
-                )
-                t = Torrent.from_file(torrent_path)
-                torrent_hash = t.infohash_v1.hex()
-                if torrent_hash in existing_hashes:
-                    click.echo(
-                        "\t\t⚠️ Already exists, skipping",
-                        err=True,
-                    )
+                t = torrents[torrent_path]
+                if torrent_path in existing or dry_run:
                     continue
+                uploads[torrent_path] = TorrentUpload(
+                    t.torrent_id,
+                    torrent_path,
+                    skip_checking=skip_checking(torrent_path, output),
+                    hashes=frozenset(h.hex for h in t.hashes),
+                )
+            added = qb_client.add_paused_torrents(uploads.values(), category=category)
 
-                if dry_run:
-                    click.echo("\t\tℹ️ Dry run, not adding", err=True)
+            for torrent_path in torrent:
+                output.echo(f"\tAdding torrent {torrent_path}")
+                if torrent_path in existing:
+                    output.echo("\t\t⚠️ Already exists, skipping")
+                    continue
+                upload = uploads.get(torrent_path)
+                if upload is None:
+                    output.echo("\t\tℹ️ Dry run, not adding")
                     continue
 
-                try:
-                    qb_client.add_paused_torrent_by_path(
-                        torrent_path, category=category
-                    )
-                except FailedAddException:
-                    click.echo("\t\t❌ Failed to add", err=True)
+                listed_id = added[upload.torrent_id]
+                if listed_id is None:
+                    output.echo("\t\t❌ Failed to add")
                     deleteable[torrent_path] = False
                     continue
 
-                recheck_hashes.add(torrent_hash)
+                output.echo("\t\t✅ Added successfully")
 
-                click.echo("\t\t✅ Added successfully", err=True)
+                if upload.skip_checking:
+                    output.echo("\t\t🔍 Verified locally, not rechecking")
+                else:
+                    recheck_hashes.add(listed_id)
 
             if not dry_run:
-                qb_client.start_recheck(recheck_hashes)
+                echo_chunk_timings(
+                    "Recheck", qb_client.start_recheck(recheck_hashes), output
+                )
+
+    for_each_client(list(client_configs), add_to_client, jobs)
 
     if delete_after and not dry_run:
         for torrent_path, can_delete in deleteable.items():
@@ -138,6 +202,27 @@ def add(
     default=None,
     help="Only select torrents with this status.",
 )
+@click.option(
+    "--verified-data",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+    default=None,
+    help="Directory the torrents' data is saved in locally. Torrents whose data passes local verification (or passed a previous one and is unchanged since) are added without a recheck. Others are rechecked as usual.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of torrents to export from FROM_CLIENT at once",
+)
+@click.option(
+    "--export-cache-size",
+    type=click.IntRange(min=0),
+    default=64,
+    show_default=True,
+    help="MiB of exported torrents to keep in memory until every target has added them. More are spilled to disk.",
+)
 @click.option(
     "--dry-run", is_flag=True, help="Show what would be done without making changes"
 )
@@ -146,6 +231,9 @@ def cp(
     to_client: str,
     category_filter: str | None,
     status_filter: SBTorrentStatus | None,
+    verified_data: Path | None,
+    jobs: int,
+    export_cache_size: int,
     dry_run: bool,
 ):
     """
@@ -166,46 +254,84 @@ def cp(
         category_filter=category_filter, status_filter=status_filter
     )
     from_torrent_map = {t.hash: t for t in from_torrents}
-    from_hashes = {t.hash for t in from_torrents}
-
-    @cache
-    def get_torrent_data(torrent_hash: str) -> bytes:
-        return from_qb.export(torrent_hash=torrent_hash)
-
-    for name, config in to_client_configs.items():
-        with QBittorrentClient.from_config(config) as to_qb:
-            click.echo(f"Copying torrents from '{from_client}' to '{name}'", err=True)
-
-            to_torrents = to_qb.list_torrents()
-            to_hashes = {t.hash for t in to_torrents}
-            missing_hashes = from_hashes - to_hashes
-            recheck_hashes = set(missing_hashes)
 
-            for missing_hash in missing_hashes:
-                torrent_data = get_torrent_data(missing_hash)
-                torrent = from_torrent_map[missing_hash]
-                category = torrent.category
-                click.echo(f"\tAdding torrent: {torrent.name}", err=True)
+    source = _CopySource(
+        from_client,
+        from_qb,
+        from_torrent_map,
+        ExportCache(export_cache_size * 1024 * 1024),
+        verified_data,
+    )
+    targets = [
+        _CopyTarget(name, config, Output(buffered=len(to_client_configs) > 1))
+        for name, config in to_client_configs.items()
+    ]
+    runs: list[Future[None]] = []
+    try:
+        with ThreadPoolExecutor(max_workers=len(targets)) as target_executor:
+            runs = [
+                target_executor.submit(target.run, source, dry_run)
+                for target in targets
+            ]
+            try:
+                missing = [target.missing_hashes.result() for target in targets]
+                if not dry_run:
+                    _export_to_targets(source, targets, missing, jobs)
+            finally:
+                for target in targets:
+                    target.queue.put(None)
+    finally:
+        source.close()
+        for target in targets:
+            target.output.flush()
 
-                if dry_run:
-                    click.echo("\t\tℹ️ Dry run, not copying", err=True)
-                    continue
+    errors = [run.exception() for run in runs if run.exception() is not None]
+    if errors:
+        raise errors[0]
 
-                try:
-                    to_qb.add_paused_torrent_by_data(
-                        torrent_data, category=str(category)
-                    )
-                except FailedAddException:
-                    click.echo("\t\t❌ Failed to copy", err=True)
-                    recheck_hashes.remove(missing_hash)
-                    continue
 
-                click.echo("\t\t✅ Copied successfully", err=True)
+def _export_to_targets(
+    source: _CopySource,
+    targets: list[_CopyTarget],
+    missing: list[set[str]],
+    jobs: int,
+):
+    """
+    Exports the torrents that any target is missing, ``jobs`` at a time, and queues
+    each for the targets missing it. Torrents that fail to export are reported and
+    skipped.
+    """
+    # Each torrent is exported once, however many targets it goes to
+    export_targets = {
+        torrent_hash: [
+            target for target, hashes in zip(targets, missing) if torrent_hash in hashes
+        ]
+        for torrent_hash in source.torrents
+    }
+    export_targets = {h: t for h, t in export_targets.items() if t}
 
-            if not dry_run:
-                to_qb.start_recheck(hashes=recheck_hashes)
+    def export(torrent_hash: str) -> tuple[str, APIError | None]:
+        try:
+            source.export(torrent_hash, len(export_targets[torrent_hash]))
+        except APIError as e:
+            return torrent_hash, e
+        return torrent_hash, None
 
-    from_qb.logout()
+    with ThreadPoolExecutor(max_workers=jobs) as export_executor:
+        for torrent_hash, error in map_bounded(
+            export_executor, export, export_targets, 2 * jobs
+        ):
+            if error is not None:
+                name = source.torrents[torrent_hash].name
+                click.echo(
+                    f"❌ Failed to export {name} from '{source.name}': {error}",
+                    err=True,
+                )
+                for _ in export_targets[torrent_hash]:
+                    source.done(torrent_hash)
+                continue
+            for target in export_targets[torrent_hash]:
+                target.queue.put(torrent_hash)
 
 
 @sb.command()
@@ -232,22 +358,63 @@ def cp(
     default=None,
     help="Only select torrents with this category. Subcategories are included by parent categories.",
 )
+@click.option(
+    "--sort",
+    default=None,
+    help="Sort torrents by this field, like added_on, name or size",
+)
+@click.option(
+    "--reverse", is_flag=True, help="Reverse the sort order, e.g. newest first"
+)
+@click.option(
+    "--limit",
+    type=click.IntRange(min=0),
+    default=None,
+    help="List at most this many torrents",
+)
+@click.option(
+    "--offset",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Skip this many torrents first",
+)
 def ls(
     client: str,
     hashes: tuple[str],
     status_filter: TorrentStatusesT | None,
     category_filter: str | None,
+    sort: str | None,
+    reverse: bool,
+    limit: int | None,
+    offset: int,
 ):
     """List all torrents in CLIENT. May provide zero or more HASHES to select specific torrents."""
     config = Config.load_from_file()
     client_config = get_client_config(config, client)
 
     with QBittorrentClient.from_config(client_config) as qb_client:
-        torrents = qb_client.list_torrents(
-            status_filter=status_filter, hashes=hashes, category_filter=category_filter
-        )
-        json_list = [dict(t) for t in torrents]
-        click.echo(json.dumps(json_list, indent=4))
+        if sort is None and not reverse and limit is None and not offset:
+            torrents = qb_client.list_torrent_dicts(
+                status_filter=status_filter,
+                hashes=hashes,
+                category_filter=category_filter,
+            )
+        else:
+            # Sorted and partial listings are left to the client
+            torrents = [
+                t
+                for page in qb_client.iter_torrent_pages(
+                    status_filter=status_filter,
+                    hashes=hashes,
+                    category_filter=category_filter,
+                    sort=sort,
+                    reverse=reverse,
+                    limit=limit,
+                    offset=offset,
+                )
+                for t in page
+            ]
+        click.echo(json.dumps(torrents, indent=4))
 
 
 @sb.command()
@@ -270,10 +437,19 @@ def ls(
 @click.option(
     "--dry-run", is_flag=True, help="Show what would be done without making changes"
 )
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of clients to work on at once",
+)
 def recheck(
     client: str,
     status_filter: SBTorrentStatus | None,
     category_filter: str | None,
+    jobs: int,
     dry_run: bool,
 ):
     """
@@ -281,25 +457,32 @@ def recheck(
     separated by commas.
     """
     config = Config.load_from_file()
+    client_configs = {
+        name: get_client_config(config, name) for name in client.split(",")
+    }
 
-    for client_name in client.split(","):
-        client_config = get_client_config(config, client_name)
-
-        with QBittorrentClient.from_config(client_config) as qb_client:
-            click.echo(f"Client '{client_name}'", err=True)
+    def recheck_client(client_name: str, output: Output):
+        with QBittorrentClient.from_config(client_configs[client_name]) as qb_client:
+            output.echo(f"Client '{client_name}'")
 
             torrents = qb_client.list_torrents(
                 status_filter=status_filter, category_filter=category_filter
             )
 
             if not dry_run:
-                qb_client.start_recheck(torrent.hash for torrent in torrents)
+                echo_chunk_timings(
+                    "Recheck",
+                    qb_client.start_recheck(torrent.hash for torrent in torrents),
+                    output,
+                )
 
             for torrent in torrents:
                 if not dry_run:
-                    click.echo(f"\t🔍 Started recheck of {torrent.name}", err=True)
+                    output.echo(f"\t🔍 Started recheck of {torrent.name}")
                 else:
-                    click.echo(f"\tℹ️ Dry run, would recheck {torrent.name}", err=True)
+                    output.echo(f"\tℹ️ Dry run, would recheck {torrent.name}")
+
+    for_each_client(list(client_configs), recheck_client, jobs)
 
 
 @sb.command()
@@ -322,10 +505,19 @@ def recheck(
 @click.option(
     "--dry-run", is_flag=True, help="Show what would be done without making changes"
 )
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="Number of clients to work on at once",
+)
 def start(
     client: str,
     status_filter: SBTorrentStatus | None,
     category_filter: str | None,
+    jobs: int,
     dry_run: bool,
 ):
     """
@@ -333,27 +525,226 @@ def start(
     separated by commas.
     """
     config = Config.load_from_file()
+    client_configs = {
+        name: get_client_config(config, name) for name in client.split(",")
+    }
 
-    for client_name in client.split(","):
-        client_config = get_client_config(config, client_name)
-
-        with QBittorrentClient.from_config(client_config) as qb_client:
-            click.echo(f"Client '{client_name}'", err=True)
+    def start_client(client_name: str, output: Output):
+        with QBittorrentClient.from_config(client_configs[client_name]) as qb_client:
+            output.echo(f"Client '{client_name}'")
 
             torrents = qb_client.list_torrents(
                 status_filter=status_filter, category_filter=category_filter
             )
 
             if not dry_run:
-                qb_client.start(torrent.hash for torrent in torrents)
+                echo_chunk_timings(
+                    "Start",
+                    qb_client.start(torrent.hash for torrent in torrents),
+                    output,
+                )
 
             for torrent in torrents:
                 if not dry_run:
-                    click.echo(f"\t🏃‍➡️ Started torrent {torrent.name}", err=True)
+                    output.echo(f"\t🏃‍➡️ Started torrent {torrent.name}")
                 else:
-                    click.echo(
-                        f"\tℹ️ Dry run, would start torrent {torrent.name}", err=True
-                    )
+                    output.echo(f"\tℹ️ Dry run, would start torrent {torrent.name}")
+
+    for_each_client(list(client_configs), start_client, jobs)
+
+
+@sb.command()
+@click.argument(
+    "torrent",
+    type=click.Path(exists=True, file_okay=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "-d",
+    "--data",
+    "data_dir",
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
+    required=True,
+    help="Directory the torrent's data was saved in",
+)
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of threads hashing pieces. Defaults to one per CPU.",
+)
+@click.option(
+    "--sample",
+    type=click.FloatRange(min=0, max=1, min_open=True),
+    default=None,
+    help="Only check about this fraction of pieces, chosen per file and always including each file's first and last piece, and report a confidence figure",
+)
+@click.option(
+    "--seed",
+    type=int,
+    default=None,
+    help="Seed for choosing the pieces to sample, to make --sample repeatable",
+)
+@click.option(
+    "--restart",
+    is_flag=True,
+    help="Check every piece again instead of resuming from saved progress",
+)
+def verify(
+    torrent: Path,
+    data_dir: Path,
+    workers: int | None,
+    sample: float | None,
+    seed: int | None,
+    restart: bool,
+):
+    """
+    Verify the data of TORRENT in a local directory against its piece hashes, using
+    all cores. Prints a JSON report of each file and failed piece, and exits with
+    status 1 if any piece failed.
+
+    Progress is saved as it goes, so an interrupted run resumes where it stopped,
+    as long as the data has not changed.
+    """
+    try:
+        t = Torrent.from_file(torrent)
+        pieces = None if sample is None else sample_pieces(t, sample, seed=seed)
+        report = verify_torrent(
+            t, data_dir, workers=workers, pieces=pieces, resume=not restart
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    for file_report in report.files:
+        if file_report.missing:
+            click.echo(f"\t❓ Missing {file_report.path}", err=True)
+        elif file_report.failed_pieces:
+            click.echo(
+                f"\t❌ {file_report.path} failed "
+                f"{len(file_report.failed_pieces)} piece(s)",
+                err=True,
+            )
+        elif file_report.passed:
+            click.echo(f"\t✅ {file_report.path}", err=True)
+        elif file_report.checked_pieces:
+            click.echo(
+                f"\t🎲 {file_report.path} passed {file_report.checked_pieces} of "
+                f"{file_report.pieces} piece(s)",
+                err=True,
+            )
+        else:
+            click.echo(f"\t⏭️ {file_report.path} not checked", err=True)
+
+    if sample is not None:
+        click.echo(
+            f"\t🎲 Checked {len(report.checked_pieces)} of "
+            f"{len(report.piece_results)} pieces: at 95% confidence, at most "
+            f"{report.max_corrupt_fraction:.2%} of pieces are corrupt",
+            err=True,
+        )
+
+    click.echo(json.dumps(report.to_dict(), indent=4))
+    if not report.passed:
+        raise SystemExit(1)
+
+
+@sb.command()
+@click.argument(
+    "source",
+    type=click.Path(exists=True, file_okay=True, dir_okay=True, path_type=Path),
+)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Where to write the torrent file. Defaults to SOURCE's name plus .torrent in the current directory.",
+)
+@click.option(
+    "--version",
+    "torrent_version",
+    type=click.Choice(torrent_versions),
+    default="hybrid",
+    show_default=True,
+    help="Which BitTorrent protocol versions the torrent supports",
+)
+@click.option(
+    "--piece-length",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Piece length in bytes, a power of two of at least 16 KiB. Chosen from the total size by default.",
+)
+@click.option(
+    "-t",
+    "--tracker",
+    "trackers",
+    multiple=True,
+    help="Announce URL of a tracker. May be given more than once.",
+)
+@click.option("--private", is_flag=True, help="Mark the torrent private (BEP 27)")
+@click.option("--comment", default=None, help="Comment to store in the torrent")
+@click.option(
+    "-w",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of threads hashing pieces. Defaults to one per CPU.",
+)
+def create(
+    source: Path,
+    output: Path | None,
+    torrent_version: TorrentVersion,
+    piece_length: int | None,
+    trackers: tuple[str, ...],
+    private: bool,
+    comment: str | None,
+    workers: int | None,
+):
+    """
+    Create a torrent of SOURCE, a file or directory, hashing pieces on all cores.
+    Prints the new torrent's info hashes as JSON.
+
+    The torrent is ready for `add`: it is already in the torrent cache, and SOURCE's
+    parent directory is recorded as verified data for it.
+    """
+    source = source.absolute()
+    if output is None:
+        output = Path(f"{source.name}.torrent")
+    if output.exists():
+        raise click.ClickException(f"{output} already exists.")
+
+    click.echo(f"Creating {output} from {source}", err=True)
+    try:
+        t = create_torrent(
+            source,
+            output,
+            version=torrent_version,
+            piece_length=piece_length,
+            trackers=trackers,
+            private=private,
+            comment=comment,
+            workers=workers,
+        )
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(
+        f"\t✅ Created {t.name} with {len(t.files)} file(s), piece length "
+        f"{t.piece_length}",
+        err=True,
+    )
+
+    click.echo(
+        json.dumps(
+            {
+                "path": str(output),
+                "name": str(t.name),
+                "size": t.size,
+                "infohash_v1": t.infohash_v1 and t.infohash_v1.hex(),
+                "infohash_v2": t.infohash_v2 and t.infohash_v2.hex(),
+            },
+            indent=4,
+        )
+    )
 
 
 @sb.command()
@@ -374,6 +765,295 @@ def lsc():
     click.echo(json.dumps(clients_dict, indent=2))
 
 
+class Output:
+    """
+    Where a command's progress messages go: straight to stderr, or, if ``buffered``,
+    held until ``flush`` so that a client's messages are not interleaved with others'.
+    """
+
+    def __init__(self, buffered: bool = False):
+        self.buffered = buffered
+        self.lines: list[str] = []
+
+    def echo(self, message: str):
+        if self.buffered:
+            self.lines.append(message)
+        else:
+            click.echo(message, err=True)
+
+    def flush(self):
+        for line in self.lines:
+            click.echo(line, err=True)
+        self.lines.clear()
+
+
+def for_each_client(
+    client_names: list[str], work: Callable[[str, Output], None], jobs: int
+):
+    """
+    Runs ``work`` for each client, up to ``jobs`` at once. Each client's messages are
+    printed together, in the order the clients were given, as soon as it and the
+    clients before it are done. If any client fails, the first failure is raised once
+    the others are done.
+    """
+    # One client at a time, messages can be printed as they come
+    sequential = jobs == 1 or len(client_names) == 1
+
+    def run(client_name: str) -> tuple[Output, BaseException | None]:
+        output = Output(buffered=not sequential)
+        try:
+            work(client_name, output)
+        except Exception as e:
+            return output, e
+        return output, None
+
+    errors: list[BaseException] = []
+    with ThreadPoolExecutor(max_workers=1 if sequential else jobs) as executor:
+        for output, error in executor.map(run, client_names):
+            output.flush()
+            if error is not None:
+                errors.append(error)
+    if errors:
+        raise errors[0]
+
+
+# Exported torrents waiting to be added to a target, beyond which exporting waits
+_COPY_QUEUE_SIZE = 1000
+# Exported torrents added to a target at once, at most
+_COPY_BATCH_SIZE = 100
+
+
+class _CopySource:
+    """
+    The client that ``cp`` copies torrents from. Each torrent is exported once into a
+    cache shared by the targets, and forgotten once every target missing it has had
+    it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        qb_client: QBittorrentClient,
+        torrents: dict[str, TorrentRecord],
+        export_cache: ExportCache,
+        verified_data: Path | None,
+    ):
+        self.name = name
+        self.qb_client = qb_client
+        self.torrents = torrents
+        self.export_cache = export_cache
+        self.verified_data = verified_data
+        self._skip_checking: dict[str, bool] = {}
+        # What verifying each exported torrent reported, for the targets to echo
+        self._verify_messages: dict[str, list[str]] = {}
+        # How many targets are yet to have each exported torrent
+        self._remaining: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._verify_lock = threading.Lock()
+
+    def export(self, torrent_hash: str, target_count: int):
+        """
+        Exports a torrent for ``target_count`` targets, and verifies its data. If the
+        export fails, each target must still be ``done`` with it.
+        """
+        with self._lock:
+            self._remaining[torrent_hash] = target_count
+        output = Output(buffered=True)
+        skip_checking = self._verified(self._data(torrent_hash), output)
+        with self._lock:
+            self._skip_checking[torrent_hash] = skip_checking
+            self._verify_messages[torrent_hash] = output.lines
+
+    def upload(self, torrent_hash: str) -> TorrentUpload:
+        """Returns an exported torrent, ready for a target to add."""
+        return TorrentUpload(
+            torrent_hash,
+            self._data(torrent_hash),
+            skip_checking=self._skip_checking[torrent_hash],
+            hashes=frozenset(torrent_hashes(self.torrents[torrent_hash])),
+        )
+
+    def verify_messages(self, torrent_hash: str) -> list[str]:
+        """Returns what verifying an exported torrent reported."""
+        with self._lock:
+            return self._verify_messages.get(torrent_hash, [])
+
+    def done(self, torrent_hash: str):
+        """Notes that a target has had an exported torrent."""
+        with self._lock:
+            self._remaining[torrent_hash] -= 1
+            if self._remaining[torrent_hash]:
+                return
+            del self._remaining[torrent_hash]
+            self._verify_messages.pop(torrent_hash, None)
+        self.export_cache.discard(torrent_hash)
+
+    def close(self):
+        self.export_cache.close()
+        self.qb_client.close()
+
+    def _data(self, torrent_hash: str) -> bytes:
+        data = self.export_cache.get(torrent_hash)
+        if data is None:
+            data = self.qb_client.export(torrent_hash=torrent_hash)
+            self.export_cache.put(torrent_hash, data)
+        return data
+
+    def _verified(self, data: bytes, output: Output) -> bool:
+        if self.verified_data is None:
+            return False
+        try:
+            t = Torrent.from_bytes(data)
+        except ValueError:
+            return False
+        # Verification already reads with many threads, so one torrent at a time
+        with self._verify_lock:
+            return verify_locally(t, self.verified_data, output)
+
+
+class _CopyTarget:
+    """
+    A client that ``cp`` copies torrents to. On a thread of its own, it finds which
+    torrents it is missing, then adds them as they are exported, in batches of
+    whatever has arrived since the last one.
+
+    Its queue holds a limited number of exported torrents, so exporting waits for the
+    slowest target rather than running arbitrarily far ahead of it.
+    """
+
+    def __init__(self, name: str, config: ClientConfig, output: Output):
+        self.name = name
+        self.config = config
+        self.output = output
+        self.queue: queue.Queue[str | None] = queue.Queue(_COPY_QUEUE_SIZE)
+        self.missing_hashes: Future[set[str]] = Future()
+
+    def run(self, source: _CopySource, dry_run: bool):
+        from_torrent_map = source.torrents
+        finished = False
+        try:
+            with QBittorrentClient.from_config(self.config) as qb_client:
+                self.output.echo(
+                    f"Copying torrents from '{source.name}' to '{self.name}'"
+                )
+
+                to_torrents = qb_client.list_torrents()
+                to_hashes = {h for t in to_torrents for h in torrent_hashes(t)}
+                # A torrent exists on the target if any of its v1 or v2 hashes match
+                missing_hashes = {
+                    torrent_hash
+                    for torrent_hash, t in from_torrent_map.items()
+                    if not torrent_hashes(t) & to_hashes
+                }
+                self.missing_hashes.set_result(missing_hashes)
+
+                if dry_run:
+                    for missing_hash in missing_hashes:
+                        torrent = from_torrent_map[missing_hash]
+                        self.output.echo(f"\tAdding torrent: {torrent.name}")
+                        self.output.echo("\t\tℹ️ Dry run, not copying")
+                    return
+
+                recheck_hashes: set[str] = set()
+                batch: list[str] = []
+                while not finished:
+                    torrent_hash = self.queue.get()
+                    if torrent_hash is None:
+                        finished = True
+                    else:
+                        batch.append(torrent_hash)
+                    if batch and (
+                        finished
+                        or len(batch) >= _COPY_BATCH_SIZE
+                        or self.queue.empty()
+                    ):
+                        recheck_hashes |= self._add(qb_client, source, batch)
+                        batch = []
+
+                echo_chunk_timings(
+                    "Recheck",
+                    qb_client.start_recheck(hashes=recheck_hashes),
+                    self.output,
+                )
+        finally:
+            if not self.missing_hashes.done():
+                self.missing_hashes.set_result(set())
+            # Exporting must not wait on a target that has failed
+            while not finished:
+                torrent_hash = self.queue.get()
+                if torrent_hash is None:
+                    finished = True
+                else:
+                    source.done(torrent_hash)
+
+    def _add(
+        self, qb_client: QBittorrentClient, source: _CopySource, batch: list[str]
+    ) -> set[str]:
+        """Adds a batch of torrents, and returns the hashes of those to recheck."""
+        from_torrent_map = source.torrents
+        # Torrents are added in batches, one set of batches per category
+        uploads: dict[str, list[TorrentUpload]] = {}
+        for torrent_hash in batch:
+            try:
+                upload = source.upload(torrent_hash)
+            except APIError as e:
+                # The export was dropped from the cache, and exporting it again failed
+                source.done(torrent_hash)
+                self.output.echo(
+                    f"\tAdding torrent: {from_torrent_map[torrent_hash].name}"
+                )
+                self.output.echo(f"\t\t❌ Failed to export: {e}")
+                continue
+            category = from_torrent_map[torrent_hash].category
+            uploads.setdefault(category, []).append(upload)
+
+        recheck_hashes: set[str] = set()
+        for category, category_uploads in uploads.items():
+            added = qb_client.add_paused_torrents(category_uploads, category=category)
+            for upload in category_uploads:
+                torrent = from_torrent_map[upload.torrent_id]
+                self.output.echo(f"\tAdding torrent: {torrent.name}")
+                for message in source.verify_messages(upload.torrent_id):
+                    self.output.echo(message)
+                source.done(upload.torrent_id)
+
+                listed_id = added[upload.torrent_id]
+                if listed_id is None:
+                    self.output.echo("\t\t❌ Failed to copy")
+                    continue
+
+                self.output.echo("\t\t✅ Copied successfully")
+
+                if upload.skip_checking:
+                    self.output.echo("\t\t🔍 Verified locally, not rechecking")
+                else:
+                    recheck_hashes.add(listed_id)
+        return recheck_hashes
+
+
+def verify_locally(torrent: Torrent, data_dir: Path, output: Output) -> bool:
+    """
+    Returns whether the data of ``torrent`` in ``data_dir`` passes local verification,
+    trusting a previous passing result if the data is unchanged since.
+    """
+    try:
+        return data_verified(torrent, data_dir)
+    except ValueError as e:
+        output.echo(f"\t\t⚠️ Cannot verify {torrent.name} locally: {e}")
+        return False
+
+
+def echo_chunk_timings(action: str, results: list[ChunkResult], output: Output):
+    """Reports how long each request of a bulk action took, if it took many."""
+    if len(results) < 2:
+        return
+    for number, result in enumerate(results, start=1):
+        output.echo(
+            f"\t⏱️ {action} chunk {number}/{len(results)}: "
+            f"{result.hash_count} torrent(s) in {result.seconds:.2f}s"
+        )
+
+
 def get_client_config(config: Config, client_name: str):
     try:
         return config.clients[client_name]
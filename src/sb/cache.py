@@ -0,0 +1,509 @@
+from pathlib import Path
+from collections import OrderedDict
+from collections.abc import Iterable
+from functools import cache
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any
+
+from sb.config import cache_dir
+
+torrent_cache_path = cache_dir / "torrents.sqlite3"
+inventory_cache_path = cache_dir / "inventory.sqlite3"
+sessions_dir = cache_dir / "sessions"
+exports_dir = cache_dir / "exports"
+
+# Bumped whenever the meaning of cached rows changes, which discards all of them
+_schema_version = 1
+
+
+class TorrentCache:
+    """
+    An on-disk cache of the identifying fields of torrent files.
+
+    Entries are keyed by the file's absolute path and are only used while the file's
+    size, modification time and inode are unchanged, so an unchanged file never needs
+    to be reopened to learn its info hashes, name or total size.
+
+    The cache is an optimization only: if it cannot be read or written, lookups miss
+    and writes are dropped.
+    """
+
+    def __init__(self, path: Path = torrent_cache_path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=10)
+        # Many sb invocations may share the cache at once
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS torrents (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                infohash_v1 BLOB,
+                infohash_v2 BLOB,
+                name TEXT NOT NULL,
+                total_size INTEGER NOT NULL
+            )
+            """
+        )
+        (user_version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        if user_version != _schema_version:
+            with self.connection:
+                self.connection.execute("DELETE FROM torrents")
+                self.connection.execute(f"PRAGMA user_version = {_schema_version}")
+
+    def get(self, file_path: Path, stat: os.stat_result) -> dict[str, Any] | None:
+        """
+        Returns the cached fields of the torrent at ``file_path``, or None if there are
+        none or the file has changed since they were cached.
+        """
+        try:
+            row = self.connection.execute(
+                """
+                SELECT infohash_v1, infohash_v2, name, total_size FROM torrents
+                WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?
+                """,
+                (_key(file_path), stat.st_size, stat.st_mtime_ns, stat.st_ino),
+            ).fetchone()
+        except sqlite3.Error:
+            return None
+        if row is None:
+            return None
+        infohash_v1, infohash_v2, name, total_size = row
+        return {
+            "infohash_v1": infohash_v1,
+            "infohash_v2": infohash_v2,
+            "name": Path(name),
+            "size": total_size,
+        }
+
+    def put_many(
+        self, entries: list[tuple[Path, os.stat_result, dict[str, Any]]]
+    ) -> None:
+        """Caches the fields of many torrent files in a single transaction."""
+        rows = [
+            (
+                _key(file_path),
+                stat.st_size,
+                stat.st_mtime_ns,
+                stat.st_ino,
+                fields["infohash_v1"],
+                fields["infohash_v2"],
+                str(fields["name"]),
+                fields["size"],
+            )
+            for file_path, stat, fields in entries
+        ]
+        try:
+            with self.connection:
+                self.connection.executemany(
+                    "INSERT OR REPLACE INTO torrents VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+        except sqlite3.Error:
+            pass
+
+    def put(self, file_path: Path, stat: os.stat_result, fields: dict[str, Any]):
+        """Caches the fields of the torrent at ``file_path``."""
+        self.put_many([(file_path, stat, fields)])
+
+
+def _key(file_path: Path) -> str:
+    return str(file_path.absolute())
+
+
+@cache
+def default_torrent_cache() -> TorrentCache | None:
+    """Returns the shared cache, or None if it cannot be opened."""
+    try:
+        return TorrentCache()
+    except (OSError, sqlite3.Error):
+        return None
+
+
+class InventoryCache:
+    """
+    A local mirror of the torrents of each client, kept up to date with the deltas
+    of the WebUI's ``sync/maindata`` endpoint.
+
+    Each client's mirror records the response ID (``rid``) it is current as of, which
+    the next sync sends so that the client only returns what changed since. Torrents
+    are stored as the JSON of their fields, with their hash and category in columns
+    so that lookups by either only load the matching rows. Whether the client has
+    subcategories enabled is recorded too, along with when that was last checked.
+    """
+
+    def __init__(self, path: Path = inventory_cache_path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=10)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS inventories (
+                    client TEXT PRIMARY KEY,
+                    rid INTEGER NOT NULL,
+                    subcategories INTEGER NOT NULL
+                )
+                """
+            )
+            columns = {
+                row[1]
+                for row in self.connection.execute("PRAGMA table_info(inventories)")
+            }
+            # Added after the table, so older caches gain it in place
+            if "subcategories_checked_at" not in columns:
+                self.connection.execute(
+                    """
+                    ALTER TABLE inventories
+                    ADD COLUMN subcategories_checked_at REAL NOT NULL DEFAULT 0
+                    """
+                )
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS torrents (
+                    client TEXT NOT NULL,
+                    hash TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (client, hash)
+                )
+                """
+            )
+
+    def rid(self, client: str) -> int:
+        """Returns the response ID the mirror of ``client`` is current as of."""
+        row = self.connection.execute(
+            "SELECT rid FROM inventories WHERE client = ?", (client,)
+        ).fetchone()
+        return 0 if row is None else row[0]
+
+    def subcategories(self, client: str, max_age: float) -> bool | None:
+        """
+        Returns whether ``client`` has subcategories enabled, or None if that was not
+        checked within the last ``max_age`` seconds.
+        """
+        row = self.connection.execute(
+            """
+            SELECT subcategories FROM inventories
+            WHERE client = ? AND subcategories_checked_at >= ?
+            """,
+            (client, time.time() - max_age),
+        ).fetchone()
+        return None if row is None else bool(row[0])
+
+    def apply(
+        self,
+        client: str,
+        maindata: dict[str, Any],
+        subcategories: bool | None = None,
+    ):
+        """
+        Applies a ``sync/maindata`` response to the mirror of ``client``. A full
+        update replaces the mirror; otherwise, the changed fields of each torrent are
+        merged into what is already known.
+
+        ``subcategories`` records whether the client has subcategories enabled,
+        which decides how categories are matched, as just checked. It must be given
+        for the first update of a client, and may be left out after that to keep the
+        recorded value.
+        """
+        changed: dict[str, dict[str, Any]] = maindata.get("torrents", {})
+        checked_at = None if subcategories is None else time.time()
+        with self.connection:
+            if maindata.get("full_update"):
+                self.connection.execute(
+                    "DELETE FROM torrents WHERE client = ?", (client,)
+                )
+                merged = changed
+            else:
+                merged = self._load(client, list(changed))
+                for torrent_hash, fields in changed.items():
+                    merged.setdefault(torrent_hash, {}).update(fields)
+                self.connection.executemany(
+                    "DELETE FROM torrents WHERE client = ? AND hash = ?",
+                    [
+                        (client, torrent_hash)
+                        for torrent_hash in maindata.get("torrents_removed", [])
+                    ],
+                )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO torrents VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        client,
+                        torrent_hash,
+                        fields.get("category", ""),
+                        json.dumps({**fields, "hash": torrent_hash}),
+                    )
+                    for torrent_hash, fields in merged.items()
+                ],
+            )
+            self.connection.execute(
+                """
+                INSERT INTO inventories VALUES (?, ?, ?, ?)
+                ON CONFLICT (client) DO UPDATE SET
+                    rid = excluded.rid,
+                    subcategories = coalesce(?, subcategories),
+                    subcategories_checked_at = coalesce(?, subcategories_checked_at)
+                """,
+                (
+                    client,
+                    maindata["rid"],
+                    bool(subcategories),
+                    checked_at or 0,
+                    subcategories,
+                    checked_at,
+                ),
+            )
+
+    def _load(
+        self, client: str, torrent_hashes: list[str]
+    ) -> dict[str, dict[str, Any]]:
+        torrents: dict[str, dict[str, Any]] = {}
+        # Stay well under SQLite's limit on the number of parameters
+        for start in range(0, len(torrent_hashes), 500):
+            chunk = torrent_hashes[start : start + 500]
+            rows = self.connection.execute(
+                f"""
+                SELECT hash, data FROM torrents
+                WHERE client = ? AND hash IN ({", ".join("?" * len(chunk))})
+                """,
+                (client, *chunk),
+            )
+            torrents.update((row[0], json.loads(row[1])) for row in rows)
+        return torrents
+
+    def torrents(
+        self,
+        client: str,
+        category: str | None = None,
+        hashes: Iterable[str] | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Returns the mirrored torrents of ``client``, optionally only those in
+        ``category`` or with one of ``hashes``.
+
+        Like the client itself, a category also selects its subcategories if the
+        client has them enabled, and the empty category selects torrents with none.
+        """
+        if hashes is not None:
+            torrents = list(self._load(client, list(hashes)).values())
+        elif category is None:
+            rows = self.connection.execute(
+                "SELECT data FROM torrents WHERE client = ?", (client,)
+            )
+            torrents = [json.loads(data) for (data,) in rows]
+        else:
+            # Narrowed down to the category and its subcategories in SQL
+            rows = self.connection.execute(
+                """
+                SELECT data FROM torrents
+                WHERE client = ? AND (category = ? OR substr(category, 1, ?) = ?)
+                """,
+                (client, category, len(category) + 1, f"{category}/"),
+            )
+            torrents = [json.loads(data) for (data,) in rows]
+
+        if category is None:
+            return torrents
+        row = self.connection.execute(
+            "SELECT subcategories FROM inventories WHERE client = ?", (client,)
+        ).fetchone()
+        subcategories = row is not None and bool(row[0])
+        return [
+            t
+            for t in torrents
+            if t.get("category", "") == category
+            or (subcategories and t.get("category", "").startswith(f"{category}/"))
+        ]
+
+
+def open_inventory_cache() -> InventoryCache | None:
+    """Opens the inventory cache, or returns None if it cannot be opened."""
+    try:
+        return InventoryCache()
+    except (OSError, sqlite3.Error):
+        return None
+
+
+class SessionCache:
+    """
+    The WebUI session cookies of each client, so that every sb invocation can reuse
+    the last session instead of logging in again.
+
+    Sessions are credentials, so their files are only readable by their owner. Like
+    the torrent cache, this is an optimization only: if a session cannot be read or
+    written, the client just logs in.
+    """
+
+    def __init__(self, directory: Path = sessions_dir):
+        self.directory = directory
+
+    def _path(self, host: str, username: str) -> Path:
+        key = hashlib.sha1(f"{host}\n{username}".encode()).hexdigest()
+        return self.directory / f"{key}.json"
+
+    def get(self, host: str, username: str) -> dict[str, str] | None:
+        """Returns the cookies of the cached session, or None if there is none."""
+        try:
+            cookies = json.loads(self._path(host, username).read_text())
+        except (OSError, ValueError):
+            return None
+        return cookies if isinstance(cookies, dict) and cookies else None
+
+    def put(self, host: str, username: str, cookies: dict[str, str]):
+        """Caches the cookies of a session."""
+        path = self._path(host, username)
+        temp_path = path.with_suffix(".tmp")
+        try:
+            self.directory.mkdir(mode=0o700, parents=True, exist_ok=True)
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with open(fd, "w") as f:
+                json.dump(cookies, f)
+            temp_path.replace(path)
+        except OSError:
+            pass
+
+    def discard(self, host: str, username: str):
+        """Forgets the cached session, once it has ended."""
+        self._path(host, username).unlink(missing_ok=True)
+
+
+class ExportCache:
+    """
+    Torrent files exported from a client, keyed by info hash, for commands that add
+    each export to many clients.
+
+    At most ``budget`` bytes are kept in memory. Beyond that, the least recently used
+    exports spill to a directory, each in a file named by its info hash, and are read
+    back from there instead of being exported again. Spilled files only last as long
+    as the cache: ``close`` removes them, so a later invocation never reuses an
+    export that has since changed, like one whose trackers were edited.
+
+    The cache is safe to share between threads, and never holds its lock while
+    reading or writing files. Like the other caches, it is an optimization only: an
+    export that cannot be spilled is dropped, and misses.
+    """
+
+    def __init__(self, budget: int, directory: Path = exports_dir):
+        self.budget = budget
+        self.directory = directory
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._size = 0
+        # Evicted exports still being written to disk, which can still be read
+        self._spilling: dict[str, bytes] = {}
+        self._spilled: set[str] = set()
+        self._lock = threading.Lock()
+
+    def _path(self, torrent_hash: str) -> Path:
+        return self.directory / torrent_hash[:2] / f"{torrent_hash}.torrent"
+
+    def get(self, torrent_hash: str) -> bytes | None:
+        """Returns the cached export, or None if there is none."""
+        with self._lock:
+            data = self._entries.get(torrent_hash)
+            if data is not None:
+                self._entries.move_to_end(torrent_hash)
+                return data
+            data = self._spilling.get(torrent_hash)
+            if data is not None:
+                return data
+            if torrent_hash not in self._spilled:
+                return None
+        try:
+            return self._path(torrent_hash).read_bytes()
+        except OSError:
+            return None
+
+    def put(self, torrent_hash: str, data: bytes):
+        """Caches an export, spilling older ones to disk if over budget."""
+        evicted: list[tuple[str, bytes]] = []
+        with self._lock:
+            removed = self._forget(torrent_hash)
+            self._entries[torrent_hash] = data
+            self._size += len(data)
+            while self._size > self.budget:
+                evicted_hash, evicted_data = self._entries.popitem(last=False)
+                self._size -= len(evicted_data)
+                self._spilling[evicted_hash] = evicted_data
+                evicted.append((evicted_hash, evicted_data))
+        self._remove(removed)
+        for evicted_hash, evicted_data in evicted:
+            self._spill(evicted_hash, evicted_data)
+
+    def discard(self, torrent_hash: str):
+        """Forgets an export that is no longer needed."""
+        with self._lock:
+            removed = self._forget(torrent_hash)
+        self._remove(removed)
+
+    def close(self):
+        """Forgets every export, removing those spilled to disk."""
+        with self._lock:
+            removed = list(self._spilled)
+            self._entries.clear()
+            self._size = 0
+            self._spilling.clear()
+            self._spilled.clear()
+        self._remove(removed)
+
+    def _forget(self, torrent_hash: str) -> list[str]:
+        """
+        Forgets an export, with the lock held, and returns the hashes whose spilled
+        files are to be removed once it is released.
+        """
+        data = self._entries.pop(torrent_hash, None)
+        if data is not None:
+            self._size -= len(data)
+        # A spill in progress notices that it was forgotten, and cleans up after itself
+        self._spilling.pop(torrent_hash, None)
+        if torrent_hash in self._spilled:
+            self._spilled.discard(torrent_hash)
+            return [torrent_hash]
+        return []
+
+    def _remove(self, torrent_hashes: list[str]):
+        for torrent_hash in torrent_hashes:
+            self._remove_path(self._path(torrent_hash))
+
+    @staticmethod
+    def _remove_path(path: Path):
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
+    def _spill(self, torrent_hash: str, data: bytes):
+        path = self._path(torrent_hash)
+        # Unique per thread, in case the same export is spilled twice at once
+        temp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.write_bytes(data)
+            temp_path.replace(path)
+            written = True
+        except OSError:
+            self._remove_path(temp_path)
+            written = False
+
+        with self._lock:
+            current = self._spilling.get(torrent_hash) is data
+            if current:
+                del self._spilling[torrent_hash]
+                if written:
+                    self._spilled.add(torrent_hash)
+            # Forgotten while it was written, so the file is of no use to anyone
+            orphaned = (
+                not current
+                and torrent_hash not in self._spilling
+                and torrent_hash not in self._spilled
+            )
+        if written and orphaned:
+            self._remove([torrent_hash])
@@ -1,14 +1,38 @@
 from types import TracebackType
-from qbittorrentapi import Client
-from qbittorrentapi.torrents import TorrentStatusesT, TorrentFilesT
+import asyncio
+from collections.abc import Awaitable, Callable, Iterator, Mapping
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from qbittorrentapi import APIError, Client, Forbidden403Error
+from qbittorrentapi.torrents import (
+    TorrentStatusesT,
+    TorrentFilesT,
+)
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Literal, cast, Iterable, get_args
+import time
+from typing import Any, Literal, cast, Iterable, get_args
 
+from sb.cache import InventoryCache, SessionCache, open_inventory_cache
 from sb.config import ClientConfig
 
 type AddResponse = Literal["Ok.", "Fails."]
 type HashList = str | Iterable[str] | None
 
+# How many torrents to ask for per request when paging through torrents/info
+_PAGE_SIZE = 5000
+# Limits on the torrent files sent in one torrents/add request
+_ADD_BATCH_COUNT = 100
+_ADD_BATCH_BYTES = 16 * 1024 * 1024
+# How long to wait for added torrents to be listed, polling with growing delays
+_ADD_SETTLE_SECONDS = 3.0
+_ADD_POLL_SECONDS = 0.1
+# How long the client's preferences are trusted before a full update checks them
+_PREFERENCES_MAX_AGE = 60 * 60
+# Bulk actions send this many hashes per request, with this many requests at once
+_HASH_CHUNK_SIZE = 1000
+_HASH_CHUNK_CONCURRENCY = 4
+
 
 type SBTorrentStatus = (
     TorrentStatusesT | Literal["stopped_complete"] | Literal["stopped_downloading"]
@@ -24,9 +48,302 @@ class FailedAddException(Exception):
     pass
 
 
+class FailedLoginException(Exception):
+    pass
+
+
+@dataclass(slots=True)
+class TorrentRecord:
+    """
+    The fields of a client's torrent that commands use, built straight from the
+    WebUI API's JSON. Slotted, so large listings stay small.
+    """
+
+    hash: str
+    infohash_v1: str | None
+    infohash_v2: str | None
+    name: str
+    category: str
+    state: str
+
+    @classmethod
+    def from_json(cls, torrent: Mapping[str, Any]) -> TorrentRecord:
+        return cls(
+            hash=torrent["hash"],
+            # Clients report missing info hashes as empty strings
+            infohash_v1=torrent.get("infohash_v1") or None,
+            infohash_v2=torrent.get("infohash_v2") or None,
+            name=torrent["name"],
+            category=torrent.get("category", ""),
+            state=torrent["state"],
+        )
+
+
+@dataclass(slots=True)
+class TorrentUpload:
+    """A torrent file to add to a client."""
+
+    # The hash the client will know the torrent by, like ``TorrentRecord.hash``
+    torrent_id: str
+    # The raw torrent data, or the path of the torrent file
+    source: bytes | Path
+    skip_checking: bool = False
+    # The torrent's v1 and v2 info hashes. Clients on libtorrent 1.2 know hybrids
+    # by their v1 hash rather than ``torrent_id``, so any of them may be listed.
+    hashes: frozenset[str] = frozenset()
+
+    @property
+    def ids(self) -> set[str]:
+        """Every hash a client may list the torrent under."""
+        ids = {self.torrent_id, *self.hashes}
+        # libtorrent 2 lists v2 torrents by their v2 hash cut to a v1 hash's length
+        return ids | {h[:40] for h in ids if len(h) == 64}
+
+    @property
+    def size(self) -> int:
+        if isinstance(self.source, Path):
+            return self.source.stat().st_size
+        return len(self.source)
+
+    def read(self) -> bytes:
+        if isinstance(self.source, Path):
+            return self.source.read_bytes()
+        return self.source
+
+
+def _upload_batches(uploads: list[TorrentUpload]) -> Iterator[list[TorrentUpload]]:
+    """Splits uploads into batches small enough to send in one request."""
+    batch: list[TorrentUpload] = []
+    batch_bytes = 0
+    for upload in uploads:
+        size = upload.size
+        if batch and (
+            len(batch) >= _ADD_BATCH_COUNT or batch_bytes + size > _ADD_BATCH_BYTES
+        ):
+            yield batch
+            batch = []
+            batch_bytes = 0
+        batch.append(upload)
+        batch_bytes += size
+    if batch:
+        yield batch
+
+
+def torrent_hashes(torrent: TorrentRecord) -> set[str]:
+    """
+    Returns every hash a client knows a torrent by: its ID and, when present, its v1
+    and v2 info hashes. A v1 and a v2 hash of the same hybrid torrent both match it.
+    """
+    return {
+        h
+        for h in (torrent.hash, torrent.infohash_v1, torrent.infohash_v2)
+        if h is not None
+    }
+
+
+def _split_status_filter(
+    status_filter: SBTorrentStatus | None,
+) -> tuple[TorrentStatusesT | None, str | None]:
+    """
+    Splits a status filter into the filter the client understands and, for the
+    statuses sb adds, the torrent state to filter on locally.
+    """
+    if status_filter == "stopped_complete":
+        return None, "stoppedUP"
+    if status_filter == "stopped_downloading":
+        return None, "stoppedDL"
+    return status_filter, None
+
+
+# Torrent states, as the WebUI API reports them, grouped like qBittorrent groups them
+# for its status filters. qBittorrent 4 says 'paused' where 5 says 'stopped'.
+_stopped_states = {"stoppedUP", "stoppedDL", "pausedUP", "pausedDL"}
+_downloading_states = {
+    "downloading",
+    "metaDL",
+    "forcedMetaDL",
+    "stalledDL",
+    "checkingDL",
+    "stoppedDL",
+    "pausedDL",
+    "queuedDL",
+    "forcedDL",
+}
+_uploading_states = {"uploading", "stalledUP", "checkingUP", "queuedUP", "forcedUP"}
+_completed_states = _uploading_states | {"stoppedUP", "pausedUP"}
+_active_states = {
+    "downloading",
+    "metaDL",
+    "forcedMetaDL",
+    "forcedDL",
+    "uploading",
+    "forcedUP",
+    "moving",
+}
+_checking_states = {"checkingUP", "checkingDL", "checkingResumeData"}
+_errored_states = {"error", "missingFiles"}
+
+
+def matches_status(torrent: Mapping[str, Any], status_filter: SBTorrentStatus) -> bool:
+    """
+    Returns whether ``torrent`` matches ``status_filter``, deciding it the same way
+    qBittorrent does for its own status filters.
+    """
+    state = torrent["state"]
+    match status_filter:
+        case "all":
+            return True
+        case "downloading":
+            return state in _downloading_states
+        case "seeding":
+            return state in _uploading_states
+        case "completed":
+            return state in _completed_states
+        case "stopped" | "paused":
+            return state in _stopped_states
+        case "running" | "resumed":
+            return state not in _stopped_states
+        case "active" | "inactive":
+            # Stalled downloads count as active while they are still uploading
+            active = state in _active_states or (
+                state == "stalledDL" and torrent.get("upspeed", 0) > 0
+            )
+            return active == (status_filter == "active")
+        case "stalled":
+            return state in ("stalledUP", "stalledDL")
+        case "stalled_uploading":
+            return state == "stalledUP"
+        case "stalled_downloading":
+            return state == "stalledDL"
+        case "checking":
+            return state in _checking_states
+        case "moving":
+            return state == "moving"
+        case "errored":
+            return state in _errored_states
+        case "stopped_complete":
+            return state == "stoppedUP"
+        case "stopped_downloading":
+            return state == "stoppedDL"
+    raise ValueError(f"Unknown status filter: {status_filter!r}")
+
+
+def _split_hashes(hashes: HashList) -> list[str] | None:
+    """
+    Returns the hashes to select, lowercased as the client stores them, or None to
+    select all torrents.
+    """
+    if isinstance(hashes, str):
+        hashes = None if hashes == "all" else hashes.split("|")
+    return [h.lower() for h in hashes] if hashes else None
+
+
+@dataclass(slots=True)
+class ChunkResult:
+    """How long one request of a bulk action took."""
+
+    hash_count: int
+    seconds: float
+
+
+def _hash_chunks(hashes: HashList, chunk_size: int) -> list[list[str]]:
+    """Splits the hashes of a bulk action into the chunks to send."""
+    if hashes == "all":
+        return [["all"]]
+    if isinstance(hashes, str):
+        hashes = hashes.split("|")
+    hashes = [h for h in hashes or () if h]
+    return [hashes[i : i + chunk_size] for i in range(0, len(hashes), chunk_size)]
+
+
+def _dispatch_bulk_action(
+    send: Callable[[list[str]], None],
+    hashes: HashList,
+    chunk_size: int,
+    concurrency: int,
+) -> list[ChunkResult]:
+    """
+    Applies a bulk action to ``hashes`` by calling ``send`` with chunks of at most
+    ``chunk_size`` of them, with up to ``concurrency`` calls at once, so that no one
+    request is too large or too slow. Returns how long each chunk took, in order.
+    """
+
+    def timed_send(chunk: list[str]) -> ChunkResult:
+        started = time.perf_counter()
+        send(chunk)
+        return ChunkResult(len(chunk), time.perf_counter() - started)
+
+    chunks = _hash_chunks(hashes, chunk_size)
+    if concurrency == 1 or len(chunks) <= 1:
+        return [timed_send(chunk) for chunk in chunks]
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return list(executor.map(timed_send, chunks))
+
+
+async def _dispatch_bulk_action_async(
+    send: Callable[[list[str]], Awaitable[None]],
+    hashes: HashList,
+    chunk_size: int,
+    concurrency: int,
+) -> list[ChunkResult]:
+    """Like ``_dispatch_bulk_action``, but for asynchronous ``send`` functions."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed_send(chunk: list[str]) -> ChunkResult:
+        async with semaphore:
+            started = time.perf_counter()
+            await send(chunk)
+            return ChunkResult(len(chunk), time.perf_counter() - started)
+
+    return await asyncio.gather(
+        *(timed_send(chunk) for chunk in _hash_chunks(hashes, chunk_size))
+    )
+
+
+def _join_hashes(hashes: HashList) -> str | None:
+    """
+    Joins hashes into the "|"-separated form the WebUI API expects. qbittorrentapi
+    sends a list given as ``hashes`` as repeated fields, of which only one is read.
+    """
+    if hashes is None or isinstance(hashes, str):
+        return hashes
+    return "|".join(hashes)
+
+
 class QBittorrentClient:
-    def __init__(self, host: str, username: str, password: str):
+    """
+    A qBittorrent client.
+
+    Sessions outlive the client: logging in reuses the session cached by an earlier
+    sb invocation, and leaving the client keeps the session for the next one. Only
+    when the client rejects a session does it log in again.
+
+    Torrents are listed from a local inventory of the client's torrents, which each
+    listing brings up to date with only the changes since the last one.
+
+    Bulk actions on many hashes send them in chunks of ``hash_chunk_size``, with up
+    to ``hash_concurrency`` requests at once, and return how long each chunk took.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        sessions: SessionCache | None = None,
+        inventory: InventoryCache | None = None,
+        hash_chunk_size: int = _HASH_CHUNK_SIZE,
+        hash_concurrency: int = _HASH_CHUNK_CONCURRENCY,
+    ):
+        self.host = host
+        self.username = username
+        self.hash_chunk_size = hash_chunk_size
+        self.hash_concurrency = hash_concurrency
         self.client = Client(host=host, username=username, password=password)
+        self.sessions = sessions or SessionCache()
+        # Without an inventory, torrents are listed straight from the client
+        self.inventory = inventory or open_inventory_cache()
+        self._inventory_key = f"{username}@{host}"
 
     @classmethod
     def from_config(cls, config: ClientConfig) -> QBittorrentClient:
@@ -34,13 +351,49 @@ class QBittorrentClient:
             host=config.url,
             username=config.username,
             password=config.password,
+            hash_chunk_size=config.hash_chunk_size or _HASH_CHUNK_SIZE,
+            hash_concurrency=config.hash_concurrency or _HASH_CHUNK_CONCURRENCY,
         )
 
     def login(self):
+        """Logs in, unless there is a cached session to reuse."""
+        cookies = self.sessions.get(self.host, self.username)
+        if cookies is None:
+            self._log_in()
+            return
+        # qbittorrentapi starts a new HTTP session once it has built the base URL, so
+        # building it first keeps the restored cookies from being dropped with the old
+        self.client._url.build_base_url({}, {})
+        self.client._session.cookies.update(cookies)
+
+    def _log_in(self):
+        # Drop the rejected session, so it is not sent alongside the new one
+        self.client._session.cookies.clear()
         self.client.auth_log_in()
+        self.sessions.put(self.host, self.username, self._cookies())
+
+    def _cookies(self) -> dict[str, str]:
+        return self.client._session.cookies.get_dict()
 
     def logout(self):
+        """Logs out, which also ends the cached session."""
         self.client.auth_log_out()
+        self.sessions.discard(self.host, self.username)
+
+    def close(self):
+        """Keeps the session for the next sb invocation."""
+        if cookies := self._cookies():
+            self.sessions.put(self.host, self.username, cookies)
+
+    def _call[**P, R](
+        self, method: Callable[P, R], *args: P.args, **kwargs: P.kwargs
+    ) -> R:
+        """Calls an API method, logging in again if the session was rejected."""
+        try:
+            return method(*args, **kwargs)
+        except Forbidden403Error:
+            self._log_in()
+            return method(*args, **kwargs)
 
     def __enter__(self):
         self.login()
@@ -52,27 +405,144 @@ class QBittorrentClient:
         exc_val: BaseException | None,
         exc_tb: TracebackType | None,
     ):
-        self.logout()
+        self.close()
 
-    def _add_paused_torrent(self, path_or_data: TorrentFilesT, category: str | None):
+    def _add_paused_torrent(
+        self,
+        path_or_data: TorrentFilesT,
+        category: str | None,
+        skip_checking: bool = False,
+    ):
         response = cast(
             AddResponse,
-            self.client.torrents_add(
+            self._call(
+                self.client.torrents_add,
                 torrent_files=path_or_data,  # type: ignore
                 category=category,
                 is_paused=True,
+                is_skip_checking=skip_checking,
             ),
         )
         if response == "Fails.":
             raise FailedAddException("Failed to add torrent.")
 
-    def add_paused_torrent_by_path(self, path: Path, category: str | None):
-        """Add a torrent to the client by file path."""
-        return self._add_paused_torrent(str(path), category)
+    def add_paused_torrent_by_path(
+        self, path: Path, category: str | None, skip_checking: bool = False
+    ):
+        """
+        Add a torrent to the client by file path.
+
+        If ``skip_checking`` is set, the client assumes the torrent's data is
+        complete instead of checking it.
+        """
+        return self._add_paused_torrent(str(path), category, skip_checking)
+
+    def add_paused_torrent_by_data(
+        self, data: bytes, category: str | None, skip_checking: bool = False
+    ):
+        """
+        Add a torrent to the client by raw data.
 
-    def add_paused_torrent_by_data(self, data: bytes, category: str | None):
-        """Add a torrent to the client by raw data."""
-        return self._add_paused_torrent(data, category)
+        If ``skip_checking`` is set, the client assumes the torrent's data is
+        complete instead of checking it.
+        """
+        return self._add_paused_torrent(data, category, skip_checking)
+
+    def add_paused_torrents(
+        self, uploads: Iterable[TorrentUpload], category: str | None
+    ) -> dict[str, str | None]:
+        """
+        Adds many torrents to the client, sending them in batches of many files per
+        request. Returns, for each torrent by ID, the hash the client lists it under
+        if it was added, which may differ from its ID for hybrids, or else None.
+
+        The client only reports whether any torrent of a batch was added, so which
+        ones were is found by comparing the client's torrents before and after. If a
+        whole batch is rejected, its torrents are retried one at a time. Torrents
+        that the client already had count as not added.
+        """
+        uploads = list(uploads)
+        if not uploads:
+            return {}
+        before = self._listed_uploads(uploads)
+        rejected: set[str] = set()
+
+        for skip_checking in (False, True):
+            group = [
+                upload
+                for upload in uploads
+                if upload.skip_checking == skip_checking
+                and upload.torrent_id not in before
+            ]
+            for batch in _upload_batches(group):
+                files = {
+                    f"{upload.torrent_id}.torrent": upload.read() for upload in batch
+                }
+                try:
+                    self._add_paused_torrent(files, category, skip_checking)
+                except (FailedAddException, APIError):
+                    if len(batch) == 1:
+                        rejected.add(batch[0].torrent_id)
+                        continue
+                    for upload in batch:
+                        try:
+                            self._add_paused_torrent(
+                                upload.read(), category, skip_checking
+                            )
+                        except (FailedAddException, APIError):
+                            rejected.add(upload.torrent_id)
+
+        after = self._wait_for_uploads(
+            [
+                upload
+                for upload in uploads
+                if upload.torrent_id not in before
+                and upload.torrent_id not in rejected
+            ]
+        )
+        return {
+            upload.torrent_id: (
+                None
+                if upload.torrent_id in before
+                else after.get(upload.torrent_id)
+            )
+            for upload in uploads
+        }
+
+    def _listed_uploads(self, uploads: list[TorrentUpload]) -> dict[str, str]:
+        """
+        Returns the hash the client lists each of ``uploads`` under, by torrent ID,
+        for those it lists under any of their hashes.
+        """
+        listed_ids: dict[str, str] = {}
+        ids = sorted({h for upload in uploads for h in upload.ids})
+        for t in self.list_torrents(hashes=ids):
+            for h in torrent_hashes(t):
+                listed_ids[h] = t.hash
+        listed: dict[str, str] = {}
+        for upload in uploads:
+            for h in upload.ids:
+                if h in listed_ids:
+                    listed[upload.torrent_id] = listed_ids[h]
+                    break
+        return listed
+
+    def _wait_for_uploads(self, uploads: list[TorrentUpload]) -> dict[str, str]:
+        """
+        Like ``_listed_uploads``, but the client only lists torrents once libtorrent
+        has registered them, a moment after torrents/add returns, so this polls for
+        up to a few seconds before giving up on any.
+        """
+        if not uploads:
+            return {}
+        deadline = time.monotonic() + _ADD_SETTLE_SECONDS
+        delay = _ADD_POLL_SECONDS
+        while True:
+            listed = self._listed_uploads(uploads)
+            if len(listed) == len(uploads) or time.monotonic() >= deadline:
+                return listed
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
 
     def list_torrents(
         self,
@@ -80,39 +550,399 @@ class QBittorrentClient:
         status_filter: SBTorrentStatus | None = None,
         category_filter: str | None = None,
         hashes: HashList = None,
+    ) -> list[TorrentRecord]:
+        """Lists the torrents matching all of the given filters."""
+        return [
+            TorrentRecord.from_json(t)
+            for t in self.list_torrent_dicts(
+                status_filter=status_filter,
+                category_filter=category_filter,
+                hashes=hashes,
+            )
+        ]
+
+    def list_torrent_dicts(
+        self,
+        *,
+        status_filter: SBTorrentStatus | None = None,
+        category_filter: str | None = None,
+        hashes: HashList = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Lists the torrents matching all of the given filters, with all of their
+        fields, as the plain dicts of the API's JSON.
+        """
+        if self.inventory is None:
+            status_filter, state = _split_status_filter(status_filter)
+
+            def torrents_info(chunk: list[str] | None) -> list[dict[str, Any]]:
+                return self._call(
+                    self.client.torrents_info,
+                    category=category_filter,
+                    status_filter=status_filter,
+                    hashes=_join_hashes(chunk),
+                    SIMPLE_RESPONSES=True,
+                )
+
+            hash_list = _split_hashes(hashes)
+            if hash_list is None:
+                torrents = torrents_info(None)
+            else:
+                # Like bulk actions, many hashes are sent in chunks of them
+                torrents = []
+                _dispatch_bulk_action(
+                    lambda chunk: torrents.extend(torrents_info(chunk)),
+                    hash_list,
+                    self.hash_chunk_size,
+                    self.hash_concurrency,
+                )
+
+            if state is not None:
+                torrents = [t for t in torrents if t["state"] == state]
+
+            return torrents
+
+        self._sync_inventory()
+        return [
+            t
+            for t in self.inventory.torrents(
+                self._inventory_key,
+                category=category_filter,
+                hashes=_split_hashes(hashes),
+            )
+            if status_filter is None or matches_status(t, status_filter)
+        ]
+
+    def iter_torrent_pages(
+        self,
+        *,
+        status_filter: SBTorrentStatus | None = None,
+        category_filter: str | None = None,
+        hashes: HashList = None,
+        sort: str | None = None,
+        reverse: bool = False,
+        limit: int | None = None,
+        offset: int = 0,
+        page_size: int = _PAGE_SIZE,
+    ) -> Iterator[list[dict[str, Any]]]:
+        """
+        Yields pages of the torrents matching all of the given filters, as plain
+        dicts, straight from the client rather than the inventory.
+
+        Sorting by any torrent field, and the ``limit`` and ``offset`` of the
+        listing, are pushed down to the client, so only the requested torrents are
+        fetched. The statuses sb adds are filtered locally, so with those, pages are
+        fetched until enough torrents match.
+        """
+        status_filter, state = _split_status_filter(status_filter)
+        # With a local filter, the offset counts matching torrents, not all of them
+        to_skip = offset if state is not None else 0
+        client_offset = offset if state is None else 0
+        remaining = limit
+        while remaining is None or remaining > 0:
+            count = page_size
+            if remaining is not None and state is None:
+                count = min(page_size, remaining)
+            page: list[dict[str, Any]] = self._call(
+                self.client.torrents_info,
+                category=category_filter,
+                status_filter=status_filter,
+                hashes=_join_hashes(hashes),
+                sort=sort,
+                reverse=reverse,
+                limit=count,
+                offset=client_offset,
+                SIMPLE_RESPONSES=True,
+            )
+            client_offset += len(page)
+            exhausted = len(page) < count
+
+            if state is not None:
+                page = [t for t in page if t["state"] == state]
+                skipped = min(to_skip, len(page))
+                page = page[skipped:]
+                to_skip -= skipped
+            if remaining is not None:
+                page = page[:remaining]
+                remaining -= len(page)
+
+            if page:
+                yield page
+            if exhausted:
+                return
+
+    def _sync_inventory(self):
+        """Updates the inventory with the changes since it was last synced."""
+        assert self.inventory is not None
+        maindata = self._call(
+            self.client.sync_maindata, rid=self.inventory.rid(self._inventory_key)
+        )
+        # The client only remembers the last response of each session, so a new
+        # session starts over with a full update
+        subcategories = None
+        if maindata.get("full_update") and (
+            self.inventory.subcategories(
+                self._inventory_key, max_age=_PREFERENCES_MAX_AGE
+            )
+            is None
+        ):
+            preferences = self._call(self.client.app_preferences)
+            subcategories = bool(preferences.get("use_subcategories"))
+        self.inventory.apply(self._inventory_key, maindata, subcategories)
+
+    def _bulk_action(
+        self, method: Callable[..., Any], hashes: HashList
+    ) -> list[ChunkResult]:
+        return _dispatch_bulk_action(
+            lambda chunk: self._call(method, hashes=_join_hashes(chunk)),
+            hashes,
+            self.hash_chunk_size,
+            self.hash_concurrency,
+        )
+
+    def start_recheck(self, hashes: HashList) -> list[ChunkResult]:
+        """
+        Start a recheck for the torrent with the given hash.
+
+        Note that this does not wait for the recheck to complete.
+        """
+        return self._bulk_action(self.client.torrents_recheck, hashes)
+
+    def export(self, torrent_hash: str) -> bytes:
+        """Export the raw torrent data for the torrent with the given hash."""
+        return self._call(self.client.torrents_export, torrent_hash=torrent_hash)
+
+    def start(self, hashes: HashList) -> list[ChunkResult]:
+        """Start the torrent with the given hash."""
+        return self._bulk_action(self.client.torrents_start, hashes)
+
+
+class AsyncQBittorrentClient:
+    """
+    A client with the same surface as ``QBittorrentClient``, but asynchronous. It
+    calls the WebUI API directly over an ``httpx.AsyncClient``, so commands can
+    overlap requests to one or many clients on a single event loop.
+
+    Sessions are cached between invocations, and bulk actions are chunked, like
+    those of ``QBittorrentClient``.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        sessions: SessionCache | None = None,
+        hash_chunk_size: int = _HASH_CHUNK_SIZE,
+        hash_concurrency: int = _HASH_CHUNK_CONCURRENCY,
+    ):
+        self.host = host
+        self.username = username
+        self.hash_chunk_size = hash_chunk_size
+        self.hash_concurrency = hash_concurrency
+        self.password = password
+        if "://" not in host:
+            host = f"http://{host}"
+        self.http = httpx.AsyncClient(
+            base_url=f"{host.rstrip('/')}/api/v2/",
+            timeout=httpx.Timeout(60, connect=10),
+        )
+        self.sessions = sessions or SessionCache()
+
+    @classmethod
+    def from_config(cls, config: ClientConfig) -> AsyncQBittorrentClient:
+        return cls(
+            host=config.url,
+            username=config.username,
+            password=config.password,
+            hash_chunk_size=config.hash_chunk_size or _HASH_CHUNK_SIZE,
+            hash_concurrency=config.hash_concurrency or _HASH_CHUNK_CONCURRENCY,
+        )
+
+    async def login(self):
+        """Logs in, unless there is a cached session to reuse."""
+        cookies = self.sessions.get(self.host, self.username)
+        if cookies is None:
+            await self._log_in()
+        else:
+            self.http.cookies.update(cookies)
+
+    async def _log_in(self):
+        # Drop the rejected session, so it is not sent alongside the new one
+        self.http.cookies.clear()
+        response = await self.http.post(
+            "auth/login", data={"username": self.username, "password": self.password}
+        )
+        response.raise_for_status()
+        if response.text == "Fails.":
+            raise FailedLoginException("Failed to log in.")
+        self.sessions.put(self.host, self.username, self._cookies())
+
+    def _cookies(self) -> dict[str, str]:
+        return {cookie.name: cookie.value for cookie in self.http.cookies.jar}
+
+    async def logout(self):
+        """Logs out, which also ends the cached session."""
+        try:
+            response = await self.http.post("auth/logout")
+            response.raise_for_status()
+            self.sessions.discard(self.host, self.username)
+        finally:
+            await self.http.aclose()
+
+    async def close(self):
+        """Keeps the session for the next sb invocation."""
+        if cookies := self._cookies():
+            self.sessions.put(self.host, self.username, cookies)
+        await self.http.aclose()
+
+    async def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        """Sends a request, logging in again if the session was rejected."""
+        response = await self.http.request(method, url, **kwargs)
+        if response.status_code == 403:
+            await self._log_in()
+            response = await self.http.request(method, url, **kwargs)
+        return response
+
+    async def __aenter__(self):
+        await self.login()
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_val: BaseException | None,
+        exc_tb: TracebackType | None,
     ):
-        stopped_complete = False
-        stopped_downloading = False
-        if status_filter == "stopped_complete":
-            stopped_complete = True
-            status_filter = None
-        elif status_filter == "stopped_downloading":
-            stopped_downloading = True
-            status_filter = None
-
-        torrents = self.client.torrents_info(
-            category=category_filter, status_filter=status_filter, hashes=hashes
+        await self.close()
+
+    async def _add_paused_torrent(
+        self, data: bytes, category: str | None, skip_checking: bool = False
+    ):
+        fields = {
+            # qBittorrent 5 renamed 'paused' to 'stopped'
+            "paused": "true",
+            "stopped": "true",
+            "skip_checking": "true" if skip_checking else "false",
+        }
+        if category is not None:
+            fields["category"] = category
+        response = await self._request(
+            "POST",
+            "torrents/add",
+            data=fields,
+            files={"torrents": ("torrent", data, "application/x-bittorrent")},
         )
+        # Unparseable torrent files are rejected with 415 Unsupported Media Type
+        if response.status_code == 415 or response.text == "Fails.":
+            raise FailedAddException("Failed to add torrent.")
+        response.raise_for_status()
 
-        if stopped_complete:
-            torrents = [t for t in torrents if t.state == "stoppedUP"]
-        elif stopped_downloading:
-            torrents = [t for t in torrents if t.state == "stoppedDL"]
+    async def add_paused_torrent_by_path(
+        self, path: Path, category: str | None, skip_checking: bool = False
+    ):
+        """
+        Add a torrent to the client by file path.
+
+        If ``skip_checking`` is set, the client assumes the torrent's data is
+        complete instead of checking it.
+        """
+        return await self._add_paused_torrent(
+            path.read_bytes(), category, skip_checking
+        )
+
+    async def add_paused_torrent_by_data(
+        self, data: bytes, category: str | None, skip_checking: bool = False
+    ):
+        """
+        Add a torrent to the client by raw data.
+
+        If ``skip_checking`` is set, the client assumes the torrent's data is
+        complete instead of checking it.
+        """
+        return await self._add_paused_torrent(data, category, skip_checking)
+
+    async def list_torrents(
+        self,
+        *,
+        status_filter: SBTorrentStatus | None = None,
+        category_filter: str | None = None,
+        hashes: HashList = None,
+    ) -> list[TorrentRecord]:
+        """Lists the torrents matching all of the given filters."""
+        return [
+            TorrentRecord.from_json(t)
+            for t in await self.list_torrent_dicts(
+                status_filter=status_filter,
+                category_filter=category_filter,
+                hashes=hashes,
+            )
+        ]
+
+    async def list_torrent_dicts(
+        self,
+        *,
+        status_filter: SBTorrentStatus | None = None,
+        category_filter: str | None = None,
+        hashes: HashList = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Lists the torrents matching all of the given filters, with all of their
+        fields, as the plain dicts of the API's JSON.
+        """
+        status_filter, state = _split_status_filter(status_filter)
+
+        params = {
+            "filter": status_filter,
+            "category": category_filter,
+            "hashes": _join_hashes(hashes),
+        }
+        response = await self._request(
+            "GET",
+            "torrents/info",
+            params={key: value for key, value in params.items() if value is not None},
+        )
+        response.raise_for_status()
+        torrents: list[dict[str, Any]] = response.json()
+
+        if state is not None:
+            torrents = [t for t in torrents if t["state"] == state]
 
         return torrents
 
-    def start_recheck(self, hashes: HashList):
+    async def _bulk_action(
+        self, endpoint: str, hashes: HashList, fallback_endpoint: str | None = None
+    ) -> list[ChunkResult]:
+        async def send(chunk: list[str]):
+            data = {"hashes": "|".join(chunk)}
+            response = await self._request("POST", endpoint, data=data)
+            if response.status_code == 404 and fallback_endpoint is not None:
+                response = await self._request("POST", fallback_endpoint, data=data)
+            response.raise_for_status()
+
+        return await _dispatch_bulk_action_async(
+            send, hashes, self.hash_chunk_size, self.hash_concurrency
+        )
+
+    async def start_recheck(self, hashes: HashList) -> list[ChunkResult]:
         """
         Start a recheck for the torrent with the given hash.
 
         Note that this does not wait for the recheck to complete.
         """
-        self.client.torrents_recheck(hashes=hashes)
+        return await self._bulk_action("torrents/recheck", hashes)
 
-    def export(self, torrent_hash: str) -> bytes:
+    async def export(self, torrent_hash: str) -> bytes:
         """Export the raw torrent data for the torrent with the given hash."""
-        return self.client.torrents_export(torrent_hash=torrent_hash)
+        response = await self._request(
+            "GET", "torrents/export", params={"hash": torrent_hash}
+        )
+        response.raise_for_status()
+        return response.content
 
-    def start(self, hashes: HashList):
+    async def start(self, hashes: HashList) -> list[ChunkResult]:
         """Start the torrent with the given hash."""
-        self.client.torrents_start(hashes=hashes)
+        # qBittorrent 4 calls starting 'resume'
+        return await self._bulk_action(
+            "torrents/start", hashes, fallback_endpoint="torrents/resume"
+        )
@@ -0,0 +1,19 @@
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, Future
+
+
+def map_bounded[T, R](
+    executor: Executor, fn: Callable[[T], R], items: Iterable[T], limit: int
+) -> Iterator[R]:
+    """
+    Like ``executor.map``, but only keeps ``limit`` items in flight, so that huge
+    inputs are not all submitted up front.
+    """
+    pending: deque[Future[R]] = deque()
+    for item in items:
+        pending.append(executor.submit(fn, item))
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
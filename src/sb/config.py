@@ -1,14 +1,19 @@
 from pathlib import Path
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PositiveInt
 import toml
 
 config_path = Path.home() / ".config/sb/config.toml"
+cache_dir = Path.home() / ".cache/sb"
 
 class ClientConfig(BaseModel):
     url: str
     username: str
     password: str
+    # How bulk actions like recheck and start split their hashes into requests.
+    # Unset, sb's defaults are used.
+    hash_chunk_size: PositiveInt | None = None
+    hash_concurrency: PositiveInt | None = None
 
 class Config(BaseModel):
     clients: dict[str, ClientConfig]
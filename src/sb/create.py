@@ -0,0 +1,338 @@
+from pathlib import Path
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import time
+from typing import Any, Literal, NamedTuple
+
+import bencodepy
+
+from sb.cache import default_torrent_cache
+from sb.concurrency import map_bounded
+from sb.torrent import FileTable, Torrent
+from sb.verify import VerifyReport, data_fingerprint, save_result
+
+type TorrentVersion = Literal["v1", "v2", "hybrid"]
+
+torrent_versions: list[TorrentVersion] = ["v1", "v2", "hybrid"]
+
+# v2 hashes files in blocks of this size, the leaves of each file's merkle tree
+BLOCK_SIZE = 16 * 1024
+
+_MIN_PIECE_LENGTH = BLOCK_SIZE
+_MAX_PIECE_LENGTH = 16 * 1024 * 1024
+# Automatic piece lengths keep the piece count around this, so the torrent stays small
+_TARGET_PIECES = 2048
+
+
+def choose_piece_length(total_size: int) -> int:
+    """
+    Returns the smallest power-of-two piece length, between 16 KiB and 16 MiB, that
+    splits ``total_size`` bytes into at most about 2048 pieces.
+    """
+    piece_length = _MIN_PIECE_LENGTH
+    while (
+        piece_length < _MAX_PIECE_LENGTH
+        and total_size > piece_length * _TARGET_PIECES
+    ):
+        piece_length *= 2
+    return piece_length
+
+
+class _SourceFile(NamedTuple):
+    """A file to add to the torrent, as found when the source was scanned."""
+
+    path_segments: tuple[str, ...]
+    length: int
+    mtime_ns: int
+
+
+class _PieceJob(NamedTuple):
+    """The data of one piece to hash, and which hashes to compute."""
+
+    # The parts of files making up the piece, in order
+    reads: list[tuple[Path, int, int]]
+    # Zero bytes appended for the v1 hash, standing in for a padding file
+    padding: int
+    v1: bool
+    # The number of leaves of the piece's v2 merkle tree, or 0 to skip v2
+    merkle_width: int
+
+
+def _scan_source(source: Path) -> list[_SourceFile]:
+    """
+    Returns the files under ``source``, sorted by path as v2 requires, or ``source``
+    itself if it is a file.
+    """
+    if source.is_file():
+        stat = source.stat()
+        return [_SourceFile((), stat.st_size, stat.st_mtime_ns)]
+
+    files: list[_SourceFile] = []
+    for dir_path, _, file_names in os.walk(source):
+        for file_name in file_names:
+            file_path = Path(dir_path, file_name)
+            # Skips broken symlinks, sockets and the like
+            if not file_path.is_file():
+                continue
+            stat = file_path.stat()
+            files.append(
+                _SourceFile(
+                    file_path.relative_to(source).parts, stat.st_size, stat.st_mtime_ns
+                )
+            )
+    if not files:
+        raise ValueError(f"{source} contains no files.")
+    files.sort(key=lambda f: [segment.encode() for segment in f.path_segments])
+    return files
+
+
+def _merkle_root(hashes: Sequence[bytes], width: int, pad: bytes = bytes(32)) -> bytes:
+    """
+    Returns the root of the SHA256 merkle tree over ``hashes``, padded with ``pad`` to
+    ``width`` leaves, which must be a power of two.
+    """
+    layer = list(hashes) + [pad] * (width - len(hashes))
+    while len(layer) > 1:
+        layer = [
+            hashlib.sha256(layer[i] + layer[i + 1]).digest()
+            for i in range(0, len(layer), 2)
+        ]
+    return layer[0]
+
+
+def _hash_piece(job: _PieceJob) -> tuple[bytes | None, bytes | None]:
+    """
+    Returns the v1 SHA1 hash of a piece and the root of its v2 merkle tree, either of
+    which may be None if not wanted.
+    """
+    data = bytearray()
+    for path, offset, length in job.reads:
+        with open(path, "rb") as f:
+            part = os.pread(f.fileno(), length, offset)
+        if len(part) != length:
+            raise ValueError(f"{path} changed while it was being hashed.")
+        data += part
+
+    v1_hash = None
+    if job.v1:
+        sha1 = hashlib.sha1(data)
+        if job.padding:
+            sha1.update(bytes(job.padding))
+        v1_hash = sha1.digest()
+
+    v2_root = None
+    if job.merkle_width:
+        view = memoryview(data)
+        leaves = [
+            hashlib.sha256(view[i : i + BLOCK_SIZE]).digest()
+            for i in range(0, len(data), BLOCK_SIZE)
+        ]
+        v2_root = _merkle_root(leaves, job.merkle_width)
+    return v1_hash, v2_root
+
+
+def _next_power_of_two(n: int) -> int:
+    return 1 << max(0, n - 1).bit_length()
+
+
+def create_torrent(
+    source: Path,
+    output: Path,
+    version: TorrentVersion = "hybrid",
+    piece_length: int | None = None,
+    trackers: Sequence[str] = (),
+    private: bool = False,
+    comment: str | None = None,
+    workers: int | None = None,
+) -> Torrent:
+    """
+    Creates a torrent of ``source``, a file or a directory, and writes it to
+    ``output``.
+
+    Pieces are hashed by a pool of ``workers`` threads (by default, one per CPU).
+    Hybrid torrents align every file to a piece boundary with BEP 47 padding files, so
+    each piece lies in a single file and both of its hashes come from one read.
+
+    The new torrent is added to the torrent cache, and for v1 and hybrid torrents, its
+    data is recorded as verified in the parent directory of ``source``, so that
+    ``add --verified-data`` neither re-reads the torrent nor rehashes the data.
+    """
+    files = _scan_source(source)
+    total_size = sum(f.length for f in files)
+    if piece_length is None:
+        piece_length = choose_piece_length(total_size)
+    elif piece_length < _MIN_PIECE_LENGTH or piece_length & (piece_length - 1):
+        raise ValueError("Piece length must be a power of two of at least 16 KiB.")
+    has_v1 = version != "v2"
+    has_v2 = version != "v1"
+    single_file = source.is_file()
+
+    # The v1 'files' list, including padding files for hybrids
+    files_value: list[dict[bytes, Any]] = []
+    for file_index, f in enumerate(files):
+        files_value.append(
+            {b"length": f.length, b"path": [s.encode() for s in f.path_segments]}
+        )
+        padding = -f.length % piece_length
+        if version == "hybrid" and padding and file_index < len(files) - 1:
+            files_value.append(
+                {
+                    b"attr": b"p",
+                    b"length": padding,
+                    b"path": [b".pad", str(padding).encode()],
+                }
+            )
+
+    jobs: Iterable[_PieceJob]
+    if has_v2:
+        jobs = _file_piece_jobs(source, files, piece_length, hybrid=has_v1)
+    else:
+        jobs = _piece_jobs(source, files_value, piece_length)
+
+    workers = workers or os.process_cpu_count() or 1
+    v1_hashes: list[bytes] = []
+    v2_roots: list[bytes] = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for v1_hash, v2_root in map_bounded(executor, _hash_piece, jobs, 4 * workers):
+            if v1_hash is not None:
+                v1_hashes.append(v1_hash)
+            if v2_root is not None:
+                v2_roots.append(v2_root)
+
+    for f in files:
+        stat = (source / Path(*f.path_segments)).stat()
+        if (stat.st_size, stat.st_mtime_ns) != (f.length, f.mtime_ns):
+            raise ValueError(
+                f"{source / Path(*f.path_segments)} changed while it was being hashed."
+            )
+
+    info: dict[bytes, Any] = {
+        b"name": source.name.encode(),
+        b"piece length": piece_length,
+    }
+    if private:
+        info[b"private"] = 1
+    if has_v1:
+        info[b"pieces"] = b"".join(v1_hashes)
+        if single_file:
+            info[b"length"] = total_size
+        else:
+            info[b"files"] = files_value
+
+    metainfo: dict[bytes, Any] = {
+        b"created by": b"sb",
+        b"creation date": int(time.time()),
+        b"info": info,
+    }
+    if has_v2:
+        info[b"meta version"] = 2
+        file_tree, piece_layers = _file_tree(
+            source.name if single_file else None, files, piece_length, v2_roots
+        )
+        info[b"file tree"] = file_tree
+        metainfo[b"piece layers"] = piece_layers
+    if trackers:
+        metainfo[b"announce"] = trackers[0].encode()
+        metainfo[b"announce-list"] = [[tracker.encode()] for tracker in trackers]
+    if comment:
+        metainfo[b"comment"] = comment.encode()
+
+    data = bencodepy.encode(metainfo)
+    output.write_bytes(data)
+    torrent = Torrent(data, path=output)
+
+    torrent_cache = default_torrent_cache()
+    if torrent_cache is not None:
+        torrent_cache.put(output, os.stat(output), torrent._summary())
+    if has_v1:
+        data_dir = source.parent
+        save_result(
+            VerifyReport(
+                torrent=torrent,
+                data_dir=data_dir,
+                piece_results=bytearray(b"\x01") * len(torrent.pieces),
+                fingerprint=data_fingerprint(torrent, data_dir),
+            )
+        )
+    return torrent
+
+
+def _piece_jobs(
+    source: Path, files_value: list[dict[bytes, Any]], piece_length: int
+) -> Iterator[_PieceJob]:
+    """Yields the v1 pieces of a v1-only torrent, which may span files."""
+    table = FileTable.from_files_list(files_value, root=Path())
+    for start in range(0, table.size, piece_length):
+        end = min(start + piece_length, table.size)
+        reads = [
+            (source / table.path(file_index), offset, length)
+            for file_index, offset, length in table.spans(start, end)
+        ]
+        yield _PieceJob(reads, padding=0, v1=True, merkle_width=0)
+
+
+def _file_piece_jobs(
+    source: Path, files: list[_SourceFile], piece_length: int, hybrid: bool
+) -> Iterator[_PieceJob]:
+    """
+    Yields the pieces of each file of a v2 or hybrid torrent, which always start at
+    the start of a file.
+    """
+    blocks_per_piece = piece_length // BLOCK_SIZE
+    for file_index, f in enumerate(files):
+        file_path = source / Path(*f.path_segments)
+        if f.length <= piece_length:
+            # The file's merkle tree is only as wide as its own blocks
+            merkle_width = _next_power_of_two(-(-f.length // BLOCK_SIZE))
+        else:
+            merkle_width = blocks_per_piece
+        # The v1 hash of a file's last piece includes the padding file after it
+        padded = hybrid and file_index < len(files) - 1
+        for offset in range(0, f.length, piece_length):
+            length = min(piece_length, f.length - offset)
+            yield _PieceJob(
+                [(file_path, offset, length)],
+                padding=piece_length - length if padded else 0,
+                v1=hybrid,
+                merkle_width=merkle_width,
+            )
+
+
+def _file_tree(
+    single_file_name: str | None,
+    files: list[_SourceFile],
+    piece_length: int,
+    v2_roots: list[bytes],
+) -> tuple[dict[bytes, Any], dict[bytes, bytes]]:
+    """
+    Builds the v2 'file tree' and 'piece layers' from the merkle roots of every piece
+    of every file, in order.
+    """
+    # The root of a piece of all zero blocks, which pads the piece layers
+    pad = _merkle_root([], piece_length // BLOCK_SIZE)
+    file_tree: dict[bytes, Any] = {}
+    piece_layers: dict[bytes, bytes] = {}
+    position = 0
+    for f in files:
+        leaf: dict[bytes, Any] = {b"length": f.length}
+        if f.length:
+            piece_count = -(-f.length // piece_length)
+            roots = v2_roots[position : position + piece_count]
+            position += piece_count
+            if piece_count == 1:
+                pieces_root = roots[0]
+            else:
+                pieces_root = _merkle_root(roots, _next_power_of_two(piece_count), pad)
+                piece_layers[pieces_root] = b"".join(roots)
+            leaf[b"pieces root"] = pieces_root
+
+        path_segments = (
+            [single_file_name] if single_file_name is not None else f.path_segments
+        )
+        node = file_tree
+        for segment in path_segments:
+            node = node.setdefault(segment.encode(), {})
+        node[b""] = leaf
+    return file_tree, piece_layers
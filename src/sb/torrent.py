@@ -1,11 +1,194 @@
 from pathlib import Path
+from array import array
+from bisect import bisect_right
+from collections.abc import Buffer, Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
+from functools import cached_property
 import hashlib
-from typing import Literal
+import mmap
+import operator
+import os
+from typing import Any, Iterator, Literal, NamedTuple, overload
 
-import bencodepy
+from sb.cache import default_torrent_cache
 
 type HashVersion = Literal["v1", "v2"]
+type BencodeData = bytes | bytearray | mmap.mmap
+type Token = tuple[bytes, int, int]
+
+_DICT = ord("d")
+_LIST = ord("l")
+_INT = ord("i")
+_END = ord("e")
+_DIGITS = range(ord("0"), ord("9") + 1)
+
+
+def _read_string_span(data: BencodeData, pos: int) -> tuple[int, int]:
+    """Returns the (start, end) offsets of the bencoded string payload at ``pos``."""
+    colon = data.find(b":", pos)
+    if colon == -1:
+        raise ValueError(f"Invalid bencode: unterminated string length at {pos}.")
+    start = colon + 1
+    end = start + int(data[pos:colon])
+    if end > len(data):
+        raise ValueError(f"Invalid bencode: string at {pos} runs past end of data.")
+    return start, end
+
+
+def iter_tokens(data: BencodeData, pos: int = 0) -> Iterator[Token]:
+    """
+    Lazily yields the tokens of the bencoded value that starts at ``pos``.
+
+    Each token is a ``(kind, start, end)`` tuple, where ``kind`` is ``b"d"`` or
+    ``b"l"`` for the start of a dictionary or list, ``b"e"`` for the end of one,
+    ``b"i"`` for an integer and ``b"s"`` for a string. ``start`` and ``end`` are
+    the offsets of the integer digits or string payload, so nothing is copied out of
+    ``data`` until the caller asks for it.
+    """
+    depth = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Invalid bencode: unexpected end of data.")
+        token = data[pos]
+        if token == _DICT or token == _LIST:
+            depth += 1
+            yield (b"d" if token == _DICT else b"l"), pos, pos + 1
+            pos += 1
+        elif token == _END:
+            if depth == 0:
+                raise ValueError(f"Invalid bencode: unexpected 'e' at {pos}.")
+            depth -= 1
+            yield b"e", pos, pos + 1
+            pos += 1
+        elif token == _INT:
+            end = data.find(b"e", pos)
+            if end == -1:
+                raise ValueError(f"Invalid bencode: unterminated integer at {pos}.")
+            yield b"i", pos + 1, end
+            pos = end + 1
+        elif token in _DIGITS:
+            start, pos = _read_string_span(data, pos)
+            yield b"s", start, pos
+        else:
+            raise ValueError(f"Invalid bencode: unexpected byte {token:#x} at {pos}.")
+        if depth == 0:
+            return
+
+
+def decode(data: BencodeData, pos: int = 0) -> Any:
+    """
+    Decodes the bencoded value that starts at ``pos``.
+
+    Dictionary keys are returned as ``bytes``, but string values are returned as
+    ``memoryview`` slices of ``data``, so large values like 'pieces' are never copied.
+    """
+    view = memoryview(data)
+    # Each entry is an open container and, for dictionaries, the key awaiting a value
+    stack: list[list[Any]] = []
+    for kind, start, end in iter_tokens(data, pos):
+        if kind == b"d":
+            stack.append([{}, None])
+            continue
+        if kind == b"l":
+            stack.append([[], None])
+            continue
+
+        if kind == b"e":
+            value = stack.pop()[0]
+        elif kind == b"i":
+            value = int(data[start:end])
+        else:
+            value = view[start:end]
+
+        if not stack:
+            return value
+        parent = stack[-1]
+        if isinstance(parent[0], list):
+            parent[0].append(value)
+        elif parent[1] is None:
+            if not isinstance(value, memoryview):
+                raise ValueError(
+                    f"Invalid bencode: non-string dictionary key at {start}."
+                )
+            parent[1] = bytes(value)
+        else:
+            parent[0][parent[1]] = value
+            parent[1] = None
+
+
+def _skip_value(data: BencodeData, pos: int) -> int:
+    """Returns the offset just past the bencoded value that starts at ``pos``."""
+    kind, end = b"", pos
+    for kind, _, end in iter_tokens(data, pos):
+        pass
+    # Integer tokens end at their digits, before the closing 'e'
+    return end + 1 if kind == b"i" else end
+
+
+def _dict_spans(
+    data: BencodeData, pos: int
+) -> tuple[dict[bytes, tuple[int, int]], int]:
+    """
+    Returns the (start, end) offsets of each value in the bencoded dictionary at
+    ``pos``, keyed by dictionary key, and the offset just past the dictionary.
+    """
+    if pos >= len(data) or data[pos] != _DICT:
+        raise ValueError(f"Invalid bencode: expected a dictionary at {pos}.")
+    spans: dict[bytes, tuple[int, int]] = {}
+    pos += 1
+    while True:
+        if pos >= len(data):
+            raise ValueError("Invalid bencode: unexpected end of data.")
+        if data[pos] == _END:
+            return spans, pos + 1
+        if data[pos] not in _DIGITS:
+            raise ValueError(f"Invalid bencode: non-string dictionary key at {pos}.")
+        key_start, key_end = _read_string_span(data, pos)
+        pos = _skip_value(data, key_end)
+        spans[bytes(data[key_start:key_end])] = (key_end, pos)
+
+
+def _scan_torrent(data: BencodeData) -> _Layout:
+    """
+    Returns the value spans of each key in a torrent and in its 'info' dictionary,
+    along with the (start, end) byte offsets of the bencoded 'info' value itself, in
+    a single pass over the data.
+
+    The info hashes must be computed over these exact bytes, not over a re-encoding
+    of the decoded dictionary, so that torrents with non-canonical encodings hash the
+    same way clients hash them.
+    """
+    if data[:1] != b"d":
+        raise ValueError("Invalid torrent file: not a bencoded dictionary.")
+    spans: dict[bytes, tuple[int, int]] = {}
+    info_spans: dict[bytes, tuple[int, int]] | None = None
+    pos = 1
+    while pos < len(data) and data[pos] != _END:
+        key_start, key_end = _read_string_span(data, pos)
+        key = bytes(data[key_start:key_end])
+        if key_end >= len(data):
+            raise ValueError("Invalid bencode: unexpected end of data.")
+        if key == b"info":
+            if data[key_end] != _DICT:
+                raise ValueError("Invalid torrent file: 'info' is not a dictionary.")
+            info_spans, pos = _dict_spans(data, key_end)
+        else:
+            pos = _skip_value(data, key_end)
+        spans[key] = (key_end, pos)
+    if pos >= len(data):
+        raise ValueError("Invalid bencode: unexpected end of data.")
+    if info_spans is None:
+        raise ValueError("Invalid torrent file: missing 'info' dictionary.")
+    info_start, info_end = spans[b"info"]
+    return _Layout(info_start, info_end, info_spans, spans)
+
+
+class _Layout(NamedTuple):
+    info_start: int
+    info_end: int
+    info_spans: dict[bytes, tuple[int, int]]
+    spans: dict[bytes, tuple[int, int]]
 
 
 @dataclass
@@ -21,74 +204,627 @@ class HashInfo:
         return self.value.hex()
 
 
+class PieceHashes(Sequence[bytes]):
+    """
+    A list of piece hashes, stored as one contiguous buffer.
+
+    These are the v1 'pieces' of a torrent (SHA1, 20 bytes each) or the v2 piece
+    layer of one of its files (SHA256, 32 bytes each).
+
+    Indexing or iterating returns each hash as ``bytes``. Slicing returns another
+    ``PieceHashes`` that is a view of the same buffer.
+    """
+
+    __slots__ = ("_buffer", "hash_length")
+
+    def __init__(self, buffer: Buffer, hash_length: int = 20):
+        view = memoryview(buffer).cast("B")
+        if len(view) % hash_length:
+            raise ValueError(
+                f"Invalid torrent file: piece hashes length is not a multiple of "
+                f"{hash_length}."
+            )
+        self._buffer = view
+        self.hash_length = hash_length
+
+    def __len__(self) -> int:
+        return len(self._buffer) // self.hash_length
+
+    @overload
+    def __getitem__(self, index: int) -> bytes: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> PieceHashes: ...
+
+    def __getitem__(self, index: int | slice) -> bytes | PieceHashes:
+        n = self.hash_length
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return PieceHashes(self._buffer[start * n : max(start, stop) * n], n)
+            # Strided slices are not contiguous, so they need their own buffer
+            return PieceHashes(b"".join(self[i] for i in range(start, stop, step)), n)
+
+        index = operator.index(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("piece index out of range")
+        return self._buffer[index * n : (index + 1) * n].tobytes()
+
+    def __iter__(self) -> Iterator[bytes]:
+        n = self.hash_length
+        for offset in range(0, len(self._buffer), n):
+            yield self._buffer[offset : offset + n].tobytes()
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, PieceHashes):
+            return NotImplemented
+        return self.hash_length == other.hash_length and self._buffer == other._buffer
+
+    def __repr__(self) -> str:
+        return f"PieceHashes(<{len(self)} pieces>)"
+
+
 @dataclass
 class TorrentFile:
     length: int
     path: Path
+    # BEP 47 padding files only exist to align v1 pieces, and are not stored on disk
+    padding: bool = False
+    # The root of the v2 merkle tree of the file's blocks, if it is not empty
+    pieces_root: bytes | None = None
+
+
+class FileTable(Sequence[TorrentFile]):
+    """
+    The files of a torrent, stored column by column.
+
+    Lengths and their prefix-sum offsets are kept in arrays, and each path is a run of
+    indices into a list of interned path segments. ``Path`` objects are only built for
+    the files that are actually accessed.
+    """
+
+    __slots__ = (
+        "root",
+        "lengths",
+        "offsets",
+        "_segments",
+        "_path_indices",
+        "_path_starts",
+        "_padding",
+        "_pieces_roots",
+    )
+
+    def __init__(self, root: Path):
+        self.root = root
+        self.lengths = array("Q")
+        self.offsets = array("Q", [0])
+        self._segments: list[str] = []
+        self._path_indices = array("I")
+        self._path_starts = array("Q", [0])
+        self._padding: set[int] = set()
+        self._pieces_roots: dict[int, bytes] = {}
+
+    def _append(
+        self,
+        length: int,
+        path_segments: Iterable[Buffer],
+        interned: dict[bytes, int],
+        padding: bool = False,
+        pieces_root: Buffer | None = None,
+    ):
+        # Malformed torrents would otherwise fail with a TypeError or OverflowError
+        # deep in the arrays, or, for integer segments, be silently zero-filled
+        if isinstance(length, bool) or not isinstance(length, int):
+            raise ValueError("Invalid torrent file: file 'length' is not an integer.")
+        if not 0 <= length < 1 << 64 or self.offsets[-1] + length >= 1 << 64:
+            raise ValueError(f"Invalid torrent file: file length {length} is invalid.")
+        if not isinstance(path_segments, list) or not all(
+            isinstance(segment, (bytes, memoryview)) for segment in path_segments
+        ):
+            raise ValueError("Invalid torrent file: file 'path' is not a string list.")
+        if pieces_root is not None and not isinstance(pieces_root, memoryview):
+            raise ValueError("Invalid torrent file: 'pieces root' is not a string.")
+        index = len(self.lengths)
+        self.lengths.append(length)
+        self.offsets.append(self.offsets[-1] + length)
+        for segment in path_segments:
+            key = bytes(segment)
+            segment_index = interned.get(key)
+            if segment_index is None:
+                segment_index = interned[key] = len(self._segments)
+                self._segments.append(str(key, "utf-8"))
+            self._path_indices.append(segment_index)
+        self._path_starts.append(len(self._path_indices))
+        if padding:
+            self._padding.add(index)
+        if pieces_root is not None:
+            self._pieces_roots[index] = bytes(pieces_root)
+
+    @classmethod
+    def single_file(cls, length: int, root: Path) -> FileTable:
+        """Returns the table of a single-file torrent, whose only path is ``root``."""
+        table = cls(root)
+        table._append(length, [], {})
+        return table
+
+    @classmethod
+    def from_files_list(
+        cls, files_value: list[dict[bytes, Any]], root: Path
+    ) -> FileTable:
+        """Returns the table of a multi-file torrent from its 'files' list."""
+        table = cls(root)
+        interned: dict[bytes, int] = {}
+        if not isinstance(files_value, list):
+            raise ValueError("Invalid torrent file: 'files' is not a list.")
+        for file_entry in files_value:
+            if not isinstance(file_entry, dict):
+                raise ValueError("Invalid torrent file: 'files' entry is not a dict.")
+            for key in (b"length", b"path"):
+                if key not in file_entry:
+                    raise ValueError(
+                        f"Invalid torrent file: 'files' entry is missing "
+                        f"{key.decode()!r}."
+                    )
+            attr = file_entry.get(b"attr")
+            if attr is not None and not isinstance(attr, memoryview):
+                raise ValueError("Invalid torrent file: file 'attr' is not a string.")
+            table._append(
+                file_entry[b"length"],
+                file_entry[b"path"],
+                interned,
+                padding=attr is not None and b"p" in bytes(attr),
+            )
+        return table
 
     @classmethod
-    def from_files_dict(cls, file_entry: dict[bytes, int | list[bytes]], root: Path):
-        length = file_entry.get(b"length")
-        path_segments = file_entry.get(b"path")
-        path = root / Path(*[segment.decode("utf-8") for segment in path_segments])
-        return cls(length=length, path=path)
+    def from_file_tree(cls, file_tree: dict[bytes, Any], root: Path) -> FileTable:
+        """Returns the table of a v2 torrent from its 'file tree' (BEP 52)."""
+        table = cls(root)
+        if len(file_tree) == 1:
+            # Single-file torrent: one file whose path is the root itself
+            (node,) = file_tree.values()
+            if b"" in node:
+                leaf = node[b""]
+                table._append(
+                    leaf.get(b"length"), [], {}, pieces_root=leaf.get(b"pieces root")
+                )
+                return table
+
+        interned: dict[bytes, int] = {}
+        # Depth-first, in key order, which is the order of the files in the torrent
+        stack: list[tuple[list[bytes], Iterator[tuple[bytes, Any]]]] = [
+            ([], iter(file_tree.items()))
+        ]
+        while stack:
+            parents, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                continue
+            segment, node = child
+            path_segments = parents + [segment]
+            if b"" in node:
+                leaf = node[b""]
+                table._append(
+                    leaf.get(b"length"),
+                    path_segments,
+                    interned,
+                    pieces_root=leaf.get(b"pieces root"),
+                )
+            else:
+                stack.append((path_segments, iter(node.items())))
+        return table
+
+    @property
+    def size(self) -> int:
+        """Total size of all files."""
+        return self.offsets[-1]
+
+    def path(self, index: int) -> Path:
+        """Returns the path of the file at ``index``, relative to the data directory."""
+        start, end = self._path_starts[index], self._path_starts[index + 1]
+        return self.root.joinpath(
+            *[self._segments[i] for i in self._path_indices[start:end]]
+        )
+
+    @property
+    def padding_size(self) -> int:
+        """Total size of all padding files."""
+        return sum(self.lengths[i] for i in self._padding)
+
+    def is_padding(self, index: int) -> bool:
+        """Returns whether the file at ``index`` is a BEP 47 padding file."""
+        return index in self._padding
+
+    def pieces_root(self, index: int) -> bytes | None:
+        """Returns the v2 pieces root of the file at ``index``, if it has one."""
+        return self._pieces_roots.get(index)
+
+    def spans(self, start: int, end: int) -> list[PieceSpan]:
+        """
+        Returns the parts of each file that make up bytes ``start`` to ``end`` of the
+        files laid end to end, in order.
+        """
+        offsets = self.offsets
+        spans: list[PieceSpan] = []
+        # The last file starting at or before ``start``, skipping empty files
+        file_index = bisect_right(offsets, start) - 1
+        while start < end:
+            file_end = offsets[file_index + 1]
+            if file_end > start:
+                length = min(end, file_end) - start
+                spans.append(PieceSpan(file_index, start - offsets[file_index], length))
+                start += length
+            file_index += 1
+        return spans
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    @overload
+    def __getitem__(self, index: int) -> TorrentFile: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[TorrentFile]: ...
+
+    def __getitem__(self, index: int | slice) -> TorrentFile | list[TorrentFile]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = operator.index(index)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("file index out of range")
+        return self._row(index)
+
+    def __iter__(self) -> Iterator[TorrentFile]:
+        for index in range(len(self)):
+            yield self._row(index)
+
+    def _row(self, index: int) -> TorrentFile:
+        return TorrentFile(
+            length=self.lengths[index],
+            path=self.path(index),
+            padding=self.is_padding(index),
+            pieces_root=self.pieces_root(index),
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, FileTable):
+            return NotImplemented
+        return self.root == other.root and list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"FileTable(<{len(self)} files in {str(self.root)!r}>)"
+
+
+class PieceSpan(NamedTuple):
+    """A part of a piece's data, which lies in a single file."""
+
+    file_index: int
+    offset: int
+    length: int
+
+
+def _map_file(file_path: Path) -> mmap.mmap:
+    """Memory-maps the file at ``file_path`` read-only."""
+    with open(file_path, "rb") as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError("Invalid torrent file: file is empty.")
+
+
+def _summarize_file(file_path: Path) -> dict[str, Any]:
+    """
+    Returns the fields of the torrent at ``file_path`` that are needed to identify
+    it. Runs in worker processes, so it only returns picklable values.
+    """
+    try:
+        return Torrent.from_file(file_path, use_cache=False)._summary()
+    except ValueError as e:
+        raise ValueError(f"{file_path}: {e}") from e
 
 
-@dataclass
 class Torrent:
-    name: Path
-    files: list[TorrentFile]
-    piece_length: int
-    infohash_v1: bytes  # we only support v1 for now
-    pieces: list[bytes]
+    """
+    A .torrent file.
+
+    Only the layout of the info dictionary is scanned up front. The info hashes and
+    every other field are decoded from the raw data on first access, so a command
+    that only needs ``infohash_v1`` costs a single scan plus a SHA1.
+
+    v1 (BEP 3), v2 (BEP 52) and hybrid torrents are supported.
+    """
+
+    def __init__(self, data: BencodeData, path: Path | None = None):
+        self.path = path
+        self._data = data
+        # Scanning also validates the torrent, so the cached property is read just for
+        # its side effect: a malformed torrent fails here, not on first use
+        _ = self._layout
 
     @classmethod
-    def from_file(cls, file_path: Path):
-        with open(file_path, "rb") as f:
-            torrent_data = bencodepy.decode(f.read())
+    def from_file(cls, file_path: Path, use_cache: bool = True):
+        """
+        Opens the torrent at ``file_path``.
 
-        info: dict = torrent_data.get(b"info")
-        if info is None:
-            raise ValueError("Invalid torrent file: missing 'info' dictionary.")
+        The file is memory-mapped rather than read, so the torrent only holds views
+        into the mapping and large torrents are never copied into memory.
 
-        # The info hash is calculated from the raw bencoded bytes of the 'info' dict
-        raw_info_bencoded = bencodepy.encode(info)
+        If ``use_cache`` is set, the info hashes, name and size of the torrent are
+        looked up in the on-disk torrent cache. If the file is unchanged since they
+        were cached, it is not opened unless some other field is accessed. Otherwise,
+        they are computed now and cached for next time.
+        """
+        torrent_cache = default_torrent_cache() if use_cache else None
+        if torrent_cache is None:
+            return cls(_map_file(file_path), path=file_path)
 
-        # --- Detect v1/v2 and calculate info hashes ---
-        pieces: list[bytes] | None = None
+        stat = os.stat(file_path)
+        fields = torrent_cache.get(file_path, stat)
+        if fields is not None:
+            return cls._deferred(file_path, fields)
 
-        # Check for v1 (BEP 3)
-        if b"pieces" not in info:
-            raise ValueError("Unsupported torrent: missing 'pieces' for v1 torrent.")
-        infohash_v1 = hashlib.sha1(raw_info_bencoded).digest()
+        torrent = cls(_map_file(file_path), path=file_path)
+        torrent_cache.put(file_path, stat, torrent._summary())
+        return torrent
 
-        # Parse the v1 piece hashes
-        pieces_value = info.get(b"pieces")
-        pieces = [pieces_value[i : i + 20] for i in range(0, len(pieces_value), 20)]
+    @classmethod
+    def from_bytes(cls, data: BencodeData):
+        """Opens a torrent from its raw bencoded data."""
+        return cls(data)
 
-        name = Path(info.get(b"name").decode("utf-8"))
-        piece_length = info.get(b"piece length")
+    @classmethod
+    def from_files(
+        cls,
+        file_paths: Iterable[Path],
+        workers: int | None = None,
+        use_cache: bool = True,
+    ) -> list[Torrent]:
+        """
+        Opens many torrent files at once, hashing them across a pool of ``workers``
+        processes (by default, one per CPU).
 
-        files_value = info.get(b"files")
-        if files_value is None:
-            # Single-file torrent
-            files = [TorrentFile(length=info.get(b"length"), path=name)]
+        The returned torrents already know their info hashes, name and size. Their
+        files are only reopened in this process if some other field is accessed.
+
+        If ``use_cache`` is set, only files that are missing from the on-disk torrent
+        cache, or have changed since they were cached, are hashed.
+        """
+        file_paths = list(file_paths)
+        torrent_cache = default_torrent_cache() if use_cache else None
+
+        summaries: dict[Path, dict[str, Any]] = {}
+        stats: dict[Path, os.stat_result] = {}
+        if torrent_cache is not None:
+            for file_path in file_paths:
+                stats[file_path] = stat = os.stat(file_path)
+                fields = torrent_cache.get(file_path, stat)
+                if fields is not None:
+                    summaries[file_path] = fields
+        missing = [file_path for file_path in file_paths if file_path not in summaries]
+
+        workers = workers or os.process_cpu_count() or 1
+        if workers == 1 or len(missing) <= 1:
+            summaries.update(zip(missing, map(_summarize_file, missing)))
         else:
-            # Multi-file torrent
-            files = [
-                TorrentFile.from_files_dict(file, root=name)
-                for file in info.get(b"files", [])
-            ]
-
-        return cls(
-            name=name,
-            piece_length=piece_length,
-            pieces=pieces,
-            files=files,
-            infohash_v1=infohash_v1,
-        )
+            chunksize = max(1, len(missing) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                summaries.update(
+                    zip(
+                        missing,
+                        executor.map(_summarize_file, missing, chunksize=chunksize),
+                    )
+                )
+
+        if torrent_cache is not None and missing:
+            torrent_cache.put_many(
+                [
+                    (file_path, stats[file_path], summaries[file_path])
+                    for file_path in missing
+                ]
+            )
+
+        return [
+            cls._deferred(file_path, summaries[file_path]) for file_path in file_paths
+        ]
+
+    @classmethod
+    def _deferred(cls, file_path: Path, known: dict[str, Any]) -> Torrent:
+        """
+        Returns a torrent for ``file_path`` whose ``known`` fields were computed
+        elsewhere. The file is only opened if some other field is accessed.
+        """
+        torrent = cls.__new__(cls)
+        torrent.path = file_path
+        # Cached properties read their values from the instance dict
+        torrent.__dict__.update(known)
+        return torrent
+
+    def _summary(self) -> dict[str, Any]:
+        """Returns the fields that identify this torrent, as stored in the cache."""
+        return {
+            "infohash_v1": self.infohash_v1,
+            "infohash_v2": self.infohash_v2,
+            "name": self.name,
+            "size": self.size,
+        }
+
+    @cached_property
+    def _data(self) -> BencodeData:
+        return _map_file(self.path)
+
+    @cached_property
+    def _layout(self) -> _Layout:
+        layout = _scan_torrent(self._data)
+
+        # A torrent must be v1 (BEP 3), v2 (BEP 52) or both (a hybrid)
+        if b"pieces" not in layout.info_spans and b"file tree" not in layout.info_spans:
+            raise ValueError("Invalid torrent file: missing 'pieces' or 'file tree'.")
+        return layout
+
+    def _info_value(self, key: bytes) -> Any:
+        """Decodes the value of ``key`` in the info dictionary."""
+        span = self._layout.info_spans.get(key)
+        if span is None:
+            raise ValueError(f"Invalid torrent file: missing {key.decode()!r}.")
+        return decode(self._data, span[0])
+
+    @property
+    def _raw_info(self) -> memoryview:
+        """The raw bencoded bytes of the 'info' dict, as a view into the data."""
+        return memoryview(self._data)[self._layout.info_start : self._layout.info_end]
+
+    # The info hashes are calculated from the raw bencoded bytes of the 'info' dict,
+    # hashed in place rather than re-encoded from the decoded dict
+
+    @cached_property
+    def infohash_v1(self) -> bytes | None:
+        """The SHA1 info hash, or None if this is a v2-only torrent."""
+        if b"pieces" not in self._layout.info_spans:
+            return None
+        return hashlib.sha1(self._raw_info).digest()
+
+    @cached_property
+    def infohash_v2(self) -> bytes | None:
+        """The SHA256 info hash, or None if this is a v1-only torrent."""
+        if self._meta_version != 2 or b"file tree" not in self._layout.info_spans:
+            return None
+        return hashlib.sha256(self._raw_info).digest()
+
+    @property
+    def hashes(self) -> list[HashInfo]:
+        """All info hashes of this torrent: v1, v2 or, for hybrids, both."""
+        hashes: list[HashInfo] = []
+        if self.infohash_v1 is not None:
+            hashes.append(HashInfo(version="v1", value=self.infohash_v1))
+        if self.infohash_v2 is not None:
+            hashes.append(HashInfo(version="v2", value=self.infohash_v2))
+        return hashes
+
+    @property
+    def torrent_id(self) -> str:
+        """
+        The hash that qBittorrent identifies this torrent by: the v2 info hash
+        truncated to the length of a v1 hash if there is one, as for hybrids, or else
+        the v1 info hash. This is libtorrent's ``info_hash_t::get_best()``.
+        """
+        if self.infohash_v2 is not None:
+            return self.infohash_v2.hex()[:40]
+        assert self.infohash_v1 is not None
+        return self.infohash_v1.hex()
 
     @property
+    def _meta_version(self) -> int:
+        if b"meta version" not in self._layout.info_spans:
+            return 1
+        return self._info_value(b"meta version")
+
+    @cached_property
+    def name(self) -> Path:
+        return Path(str(self._info_value(b"name"), "utf-8"))
+
+    @cached_property
+    def piece_length(self) -> int:
+        return self._info_value(b"piece length")
+
+    @cached_property
+    def pieces(self) -> PieceHashes:
+        """The v1 piece hashes."""
+        # The v1 piece hashes stay a view of the 'pieces' string
+        return PieceHashes(self._info_value(b"pieces"))
+
+    @cached_property
+    def files(self) -> FileTable:
+        """
+        The files of the torrent. For v1 and hybrid torrents, these are the v1 files,
+        including any padding files. For v2-only torrents, this is the file tree.
+        """
+        spans = self._layout.info_spans
+        if b"pieces" not in spans:
+            return self.file_tree
+        if b"files" not in spans:
+            # Single-file torrent
+            return FileTable.single_file(self._info_value(b"length"), root=self.name)
+        # Multi-file torrent
+        return FileTable.from_files_list(self._info_value(b"files"), root=self.name)
+
+    @cached_property
+    def file_tree(self) -> FileTable:
+        """The files of a v2 or hybrid torrent, from its 'file tree'."""
+        return FileTable.from_file_tree(self._info_value(b"file tree"), root=self.name)
+
+    @cached_property
+    def piece_layers(self) -> dict[bytes, PieceHashes]:
+        """
+        The v2 piece layers, keyed by the pieces root of each file. Files no longer
+        than one piece have no layer, since their pieces root covers them entirely.
+
+        Each layer is a view of the torrent data.
+        """
+        span = self._layout.spans.get(b"piece layers")
+        if span is None:
+            return {}
+        return {
+            pieces_root: PieceHashes(layer, hash_length=32)
+            for pieces_root, layer in decode(self._data, span[0]).items()
+        }
+
+    def piece_spans(self, index: int) -> list[PieceSpan]:
+        """
+        Returns where the data of the v1 piece at ``index`` lives: the parts of each
+        file it covers, in order. Found by bisecting the files' prefix-sum offsets,
+        so this is O(log n) in the number of files.
+        """
+        files = self.files
+        piece_length = self.piece_length
+        start = index * piece_length
+        if not 0 <= start < files.size:
+            raise IndexError("piece index out of range")
+        return files.spans(start, min(start + piece_length, files.size))
+
+    def pieces_for_file(self, file_index: int) -> range:
+        """Returns the indices of the v1 pieces covering the file at ``file_index``."""
+        offsets = self.files.offsets
+        start, end = offsets[file_index], offsets[file_index + 1]
+        if start == end:
+            return range(0)
+        return range(start // self.piece_length, (end - 1) // self.piece_length + 1)
+
+    @cached_property
     def size(self) -> int:
-        """Total size of all files in the torrent."""
-        return sum(file.length for file in self.files)
+        """Total size of all files in the torrent, not counting padding files."""
+        return self.files.size - self.files.padding_size
+
+    def close(self):
+        """
+        Releases the memory map of the torrent file. Fields already read stay
+        available, apart from the views of the data (``pieces`` and
+        ``piece_layers``), which are read again by reopening the file if accessed.
+        Torrents read from bytes, rather than a file, are left as they are.
+        """
+        if self.path is None:
+            return
+        data = self.__dict__.pop("_data", None)
+        for name in ("_layout", "pieces", "piece_layers"):
+            self.__dict__.pop(name, None)
+        if isinstance(data, mmap.mmap):
+            try:
+                data.close()
+            except BufferError:
+                # Views still held elsewhere keep the mapping until they are freed
+                pass
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Torrent):
+            return NotImplemented
+        return self._raw_info == other._raw_info
+
+    def __repr__(self) -> str:
+        return (
+            f"Torrent(name={str(self.name)!r}, "
+            f"torrent_id={self.torrent_id!r})"
+        )
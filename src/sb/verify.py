@@ -0,0 +1,607 @@
+from pathlib import Path
+from collections import deque
+from collections.abc import Callable, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from functools import cached_property
+import bisect
+import hashlib
+import math
+import os
+import queue
+import random
+import struct
+import time
+from typing import Any
+
+from sb.config import cache_dir
+from sb.torrent import Torrent
+
+results_dir = cache_dir / "verify"
+
+_RESULT_MAGIC = b"SBV1"
+_BITS_TO_ASCII = bytes.maketrans(b"\x00\x01", b"01")
+_ASCII_TO_BITS = bytes.maketrans(b"01", b"\x00\x01")
+# How often a full verification saves its progress, so it can be resumed
+_CHECKPOINT_SECONDS = 10.0
+
+
+def _binomial_cdf(k: int, n: int, p: float) -> float:
+    """Returns the probability of at most ``k`` successes in ``n`` trials of ``p``."""
+    if p <= 0:
+        return 1.0
+    if p >= 1:
+        return 1.0 if k >= n else 0.0
+    # Summed in log space, since the terms underflow for large n
+    log_terms = [
+        math.lgamma(n + 1)
+        - math.lgamma(i + 1)
+        - math.lgamma(n - i + 1)
+        + i * math.log(p)
+        + (n - i) * math.log1p(-p)
+        for i in range(k + 1)
+    ]
+    top = max(log_terms)
+    return min(1.0, math.exp(top) * math.fsum(math.exp(t - top) for t in log_terms))
+
+
+def _binomial_upper_bound(k: int, n: int, alpha: float = 0.05) -> float:
+    """
+    Returns the one-sided Clopper-Pearson upper bound, at ``1 - alpha`` confidence,
+    on the success rate of trials that had ``k`` successes in ``n``.
+    """
+    if n == 0 or k >= n:
+        return 1.0
+    if k == 0:
+        return 1 - alpha ** (1 / n)
+    # The CDF falls as p rises, so bisect for where it crosses alpha
+    low, high = k / n, 1.0
+    for _ in range(60):
+        mid = (low + high) / 2
+        if _binomial_cdf(k, n, mid) >= alpha:
+            low = mid
+        else:
+            high = mid
+    return low
+
+
+@dataclass
+class FileReport:
+    """The verification result of one file of a torrent."""
+
+    path: Path
+    length: int
+    missing: bool
+    # How many of the pieces covering the file there are, and how many were checked
+    pieces: int
+    checked_pieces: int
+    failed_pieces: list[int] = field(default_factory=list)
+
+    @property
+    def status(self) -> str:
+        """
+        'missing', 'fail', or else 'pass' if every piece of the file was checked,
+        'sampled' if only some were, and 'unchecked' if none were.
+        """
+        if self.missing:
+            return "missing"
+        if self.failed_pieces:
+            return "fail"
+        if self.checked_pieces == self.pieces:
+            return "pass"
+        return "sampled" if self.checked_pieces else "unchecked"
+
+    @property
+    def passed(self) -> bool:
+        return self.status == "pass"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "length": self.length,
+            "status": self.status,
+            "failed_pieces": self.failed_pieces,
+        }
+
+
+@dataclass
+class VerifyReport:
+    """The result of verifying a torrent's data against its piece hashes."""
+
+    torrent: Torrent
+    data_dir: Path
+    # One entry per piece: 1 if the piece's data matched its hash, else 0
+    piece_results: bytearray
+    # Identifies the state of the data files when they were verified
+    fingerprint: bytes
+    # The pieces that were checked, in order, if only a sample of them was
+    sampled: list[int] | None = None
+
+    @property
+    def checked_pieces(self) -> Sequence[int]:
+        if self.sampled is not None:
+            return self.sampled
+        return range(len(self.piece_results))
+
+    @property
+    def failed_pieces(self) -> list[int]:
+        return [i for i in self.checked_pieces if not self.piece_results[i]]
+
+    @property
+    def passed(self) -> bool:
+        return not self.failed_pieces
+
+    @property
+    def max_corrupt_fraction(self) -> float:
+        """
+        For a sampled report, an upper bound on the fraction of all pieces that are
+        corrupt, at 95% confidence.
+
+        This is the one-sided Clopper-Pearson bound: the largest corrupt fraction for
+        which drawing at most as many failing pieces as were found is still at least
+        5% likely. The bound treats the sample as uniformly random, so it is
+        approximate.
+        """
+        return _binomial_upper_bound(len(self.failed_pieces), len(self.checked_pieces))
+
+    @cached_property
+    def files(self) -> list[FileReport]:
+        files = self.torrent.files
+        reports: dict[int, FileReport] = {}
+        for file_index in range(len(files)):
+            if files.is_padding(file_index):
+                continue
+            path = files.path(file_index)
+            pieces = self.torrent.pieces_for_file(file_index)
+            if self.sampled is None:
+                checked = len(pieces)
+            else:
+                # The sample is sorted, so the file's pieces in it are a run
+                start = bisect.bisect_left(self.sampled, pieces.start)
+                checked = bisect.bisect_left(self.sampled, pieces.stop, start) - start
+            reports[file_index] = FileReport(
+                path=path,
+                length=files.lengths[file_index],
+                missing=not (self.data_dir / path).is_file(),
+                pieces=len(pieces),
+                checked_pieces=checked,
+            )
+        for piece_index in self.failed_pieces:
+            for file_index, _, _ in self.torrent.piece_spans(piece_index):
+                report = reports.get(file_index)
+                if report is not None:
+                    report.failed_pieces.append(piece_index)
+        return list(reports.values())
+
+    def to_dict(self) -> dict[str, Any]:
+        failed_pieces = self.failed_pieces
+        checked = len(self.checked_pieces)
+        report: dict[str, Any] = {
+            "name": str(self.torrent.name),
+            "hash": self.torrent.torrent_id,
+            "passed": not failed_pieces,
+            "pieces": {
+                "total": len(self.piece_results),
+                "checked": checked,
+                "passed": checked - len(failed_pieces),
+                "failed": failed_pieces,
+            },
+            "files": [report.to_dict() for report in self.files],
+        }
+        if self.sampled is not None:
+            report["sample"] = {
+                "confidence": 0.95,
+                "max_corrupt_fraction": self.max_corrupt_fraction,
+            }
+        return report
+
+
+# Reads are coalesced into batches of up to this many bytes per system call
+_COALESCE_BYTES = 8 * 1024 * 1024
+# ...and up to this many separate buffers, below the usual IOV_MAX of 1024
+_COALESCE_BUFFERS = 512
+# Piece buffers are allocated up to about this many bytes in total
+_BUFFER_BYTES = 256 * 1024 * 1024
+
+_HAS_PREADV = hasattr(os, "preadv")
+_HAS_FADVISE = hasattr(os, "posix_fadvise")
+
+
+class _PieceBuffer:
+    """A preallocated buffer holding the data of one piece as it is read."""
+
+    def __init__(self, size: int):
+        self.data = bytearray(size)
+        self.index = -1
+        self.length = 0
+        self.complete = True
+        # The number of this piece's parts that are queued but not yet read
+        self.unread = 0
+
+
+class _ScheduledReader:
+    """
+    Reads pieces of a torrent from its files under ``data_dir`` into a pool of
+    preallocated buffers, for hashing by other threads.
+
+    Pieces are read in order, which walks each file front to back, and the file
+    parts of consecutive pieces are coalesced into single vectored reads, even
+    where a piece crosses into the next file. The kernel is told the files are read
+    sequentially, so it reads ahead, and that the pages read are not needed again,
+    so verifying does not evict other data from the page cache.
+    """
+
+    def __init__(
+        self,
+        torrent: Torrent,
+        data_dir: Path,
+        free: queue.SimpleQueue[_PieceBuffer],
+        ready: queue.SimpleQueue[_PieceBuffer | None],
+        sequential: bool,
+    ):
+        self.torrent = torrent
+        self.data_dir = data_dir
+        self.free = free
+        self.ready = ready
+        self.sequential = sequential
+        self._zeros = memoryview(bytes(torrent.piece_length))
+
+        self._file_index = -1
+        self._fd: int | None = None
+        # The queued file parts, all contiguous in the current file
+        self._batch_offset = 0
+        self._batch_length = 0
+        self._batch_views: list[memoryview] = []
+        self._batch_owners: list[_PieceBuffer] = []
+        # Pieces in read order, whose parts may not all be read yet
+        self._pending: deque[_PieceBuffer] = deque()
+
+    def read(
+        self, pieces: Iterable[int], on_piece: Callable[[], None] | None = None
+    ) -> None:
+        try:
+            for index in pieces:
+                self._queue_piece(index)
+                self._release_read()
+                if on_piece is not None:
+                    on_piece()
+            self._flush()
+            self._release_read()
+        finally:
+            self._switch_file(-1)
+
+    def _queue_piece(self, index: int):
+        if self.free.empty():
+            # The pieces being coalesced may hold all the buffers, so read them now
+            # rather than wait on the hashing threads for good
+            self._flush()
+            self._release_read()
+        buffer = self.free.get()
+        buffer.index = index
+        buffer.complete = True
+        buffer.unread = 0
+        view = memoryview(buffer.data)
+        position = 0
+        for file_index, offset, length in self.torrent.piece_spans(index):
+            part = view[position : position + length]
+            position += length
+            if self.torrent.files.is_padding(file_index):
+                part[:] = self._zeros[:length]
+                continue
+            if (
+                file_index != self._file_index
+                or offset != self._batch_offset + self._batch_length
+                or self._batch_length + length > _COALESCE_BYTES
+                or len(self._batch_views) >= _COALESCE_BUFFERS
+            ):
+                self._flush()
+                self._switch_file(file_index)
+                self._batch_offset = offset
+            self._batch_views.append(part)
+            self._batch_length += length
+            self._batch_owners.append(buffer)
+            buffer.unread += 1
+        buffer.length = position
+        self._pending.append(buffer)
+
+    def _flush(self):
+        """Reads all queued file parts with one vectored read."""
+        if not self._batch_views:
+            return
+        read = 0
+        if self._fd is not None:
+            read = _read_into(self._fd, self._batch_views, self._batch_offset)
+            if read and _HAS_FADVISE:
+                # The data is in our buffers now, so its cached pages can go
+                os.posix_fadvise(
+                    self._fd, self._batch_offset, read, os.POSIX_FADV_DONTNEED
+                )
+        for view, owner in zip(self._batch_views, self._batch_owners):
+            if read < len(view):
+                # A missing or truncated file
+                owner.complete = False
+            read = max(0, read - len(view))
+            owner.unread -= 1
+        self._batch_offset += self._batch_length
+        self._batch_length = 0
+        self._batch_views = []
+        self._batch_owners = []
+
+    def _release_read(self):
+        """Hands pieces whose parts have all been read to the hashing threads."""
+        while self._pending and self._pending[0].unread == 0:
+            self.ready.put(self._pending.popleft())
+
+    def _switch_file(self, file_index: int):
+        if file_index == self._file_index:
+            return
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._file_index = file_index
+        if file_index < 0:
+            return
+        path = self.data_dir / self.torrent.files.path(file_index)
+        try:
+            self._fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            # Treated as missing, so every piece it is part of fails
+            return
+        if _HAS_FADVISE:
+            if self.sequential:
+                os.posix_fadvise(self._fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            else:
+                os.posix_fadvise(self._fd, 0, 0, os.POSIX_FADV_RANDOM)
+
+
+def _read_into(fd: int, views: list[memoryview], offset: int) -> int:
+    """
+    Fills ``views`` in order with the data of ``fd`` starting at ``offset``, and
+    returns the number of bytes read, which is less than requested at end of file.
+    """
+    total = sum(len(view) for view in views)
+    read = 0
+    while read < total:
+        # Skip past whatever the previous (partial) read already filled
+        skip = read
+        remaining: list[memoryview] = []
+        for view in views:
+            if skip >= len(view):
+                skip -= len(view)
+                continue
+            remaining.append(view[skip:])
+            skip = 0
+        if _HAS_PREADV:
+            n = os.preadv(fd, remaining, offset + read)
+        else:
+            os.lseek(fd, offset + read, os.SEEK_SET)
+            n = os.readv(fd, remaining)
+        if n == 0:
+            break
+        read += n
+    return read
+
+
+def _hash_pieces(
+    torrent: Torrent,
+    results: bytearray,
+    free: queue.SimpleQueue[_PieceBuffer],
+    ready: queue.SimpleQueue[_PieceBuffer | None],
+) -> None:
+    pieces = torrent.pieces
+    while (buffer := ready.get()) is not None:
+        if buffer.complete:
+            digest = hashlib.sha1(memoryview(buffer.data)[: buffer.length]).digest()
+            results[buffer.index] = digest == pieces[buffer.index]
+        free.put(buffer)
+
+
+def verify_torrent(
+    torrent: Torrent,
+    data_dir: Path,
+    workers: int | None = None,
+    pieces: list[int] | None = None,
+    resume: bool = True,
+) -> VerifyReport:
+    """
+    Verifies the data of ``torrent`` under ``data_dir`` against its v1 piece hashes.
+
+    Pieces are read sequentially by one thread, which keeps disks streaming, and
+    hashed by a pool of ``workers`` threads (by default, one per CPU). Hashing
+    releases the GIL, so this scales across cores.
+
+    A full verification saves its progress every few seconds, and when it stops.
+    With ``resume``, pieces that passed in an earlier run are not checked again, as
+    long as the data has not changed since.
+
+    If ``pieces`` is given, only those pieces are checked and the report is a
+    sampled one. Sampled verifications neither resume nor save progress.
+    """
+    if torrent.infohash_v1 is None:
+        raise ValueError("Verifying v2-only torrents is not supported.")
+
+    # Decode the fields the workers share before they start
+    piece_count = len(torrent.pieces)
+    fingerprint = data_fingerprint(torrent, data_dir)
+    checkpoint = None
+    if pieces is None:
+        results = (load_result(torrent, data_dir) if resume else None) or bytearray(
+            piece_count
+        )
+        checked = [index for index in range(piece_count) if not results[index]]
+        checkpoint = _Checkpoint(torrent, fingerprint, results)
+    else:
+        results = bytearray(piece_count)
+        checked = sorted(pieces)
+    workers = workers or os.process_cpu_count() or 1
+
+    # Enough buffers for a full coalesced read plus a couple per hashing thread, so
+    # the reader rarely waits on a buffer that is itself waiting to be read, as long
+    # as they fit in the memory budget. Past it, large pieces are not coalesced, so
+    # one per hashing thread and one being read still keeps every thread busy.
+    piece_length = torrent.piece_length
+    buffer_count = max(
+        min(
+            min(_COALESCE_BUFFERS, _COALESCE_BYTES // piece_length) + 2 * workers + 1,
+            _BUFFER_BYTES // piece_length,
+        ),
+        workers + 1,
+    )
+    free: queue.SimpleQueue[_PieceBuffer] = queue.SimpleQueue()
+    for _ in range(buffer_count):
+        free.put(_PieceBuffer(piece_length))
+    ready: queue.SimpleQueue[_PieceBuffer | None] = queue.SimpleQueue()
+
+    reader = _ScheduledReader(
+        torrent, data_dir, free, ready, sequential=pieces is None
+    )
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        hashers = [
+            executor.submit(_hash_pieces, torrent, results, free, ready)
+            for _ in range(workers)
+        ]
+        try:
+            reader.read(checked, checkpoint and checkpoint.maybe_save)
+        finally:
+            for _ in hashers:
+                ready.put(None)
+            # Save what was hashed, even if the read was interrupted
+            wait(hashers)
+            if checkpoint is not None:
+                checkpoint.save()
+        for hasher in hashers:
+            hasher.result()
+
+    return VerifyReport(
+        torrent=torrent,
+        data_dir=data_dir,
+        piece_results=results,
+        fingerprint=fingerprint,
+        sampled=None if pieces is None else checked,
+    )
+
+
+def sample_pieces(
+    torrent: Torrent, fraction: float, seed: int | None = None
+) -> list[int]:
+    """
+    Chooses a sample of about ``fraction`` of the pieces of ``torrent`` to verify.
+
+    The sample is stratified by file: each file contributes its share of pieces, so
+    small files are not drowned out by large ones, and the first and last piece of
+    every file are always included, since that is where truncated, misaligned or
+    partially written files show up.
+    """
+    files = torrent.files
+    rng = random.Random(seed)
+    sample: set[int] = set()
+    for file_index in range(len(files)):
+        pieces = torrent.pieces_for_file(file_index)
+        if files.is_padding(file_index) or not pieces:
+            continue
+        sample.add(pieces[0])
+        sample.add(pieces[-1])
+        inner = pieces[1:-1]
+        count = min(len(inner), math.ceil(len(inner) * fraction))
+        sample.update(rng.sample(inner, count))
+    return sorted(sample)
+
+
+def data_fingerprint(torrent: Torrent, data_dir: Path) -> bytes:
+    """
+    Returns a digest of ``data_dir`` and the size and modification time of each of
+    the torrent's files in it, which changes whenever any of the files does.
+    """
+    files = torrent.files
+    digest = hashlib.sha1(str(data_dir.absolute()).encode())
+    for file_index in range(len(files)):
+        if files.is_padding(file_index):
+            continue
+        try:
+            stat = os.stat(data_dir / files.path(file_index))
+            digest.update(struct.pack("<qq", stat.st_size, stat.st_mtime_ns))
+        except FileNotFoundError:
+            digest.update(struct.pack("<qq", -1, -1))
+    return digest.digest()
+
+
+def _result_path(torrent: Torrent) -> Path:
+    return results_dir / f"{torrent.torrent_id}.bitfield"
+
+
+def save_result(report: VerifyReport) -> None:
+    """
+    Saves which pieces of a torrent passed verification, as a bitfield with one bit
+    per piece, so that the result can be reused while the data is unchanged.
+    """
+    if report.sampled is not None:
+        raise ValueError("Sampled verification results cannot be saved.")
+    _save_bitfield(report.torrent, report.fingerprint, report.piece_results)
+
+
+def _save_bitfield(torrent: Torrent, fingerprint: bytes, results: bytearray):
+    bits = bytes(results).translate(_BITS_TO_ASCII)
+    bits += b"0" * (-len(bits) % 8)
+    bitfield = int(bits or b"0", 2).to_bytes(len(bits) // 8, "big")
+
+    path = _result_path(torrent)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_suffix(".tmp")
+    temp_path.write_bytes(_RESULT_MAGIC + fingerprint + bitfield)
+    temp_path.replace(path)
+
+
+class _Checkpoint:
+    """Periodically saves the piece results of a verification in progress."""
+
+    def __init__(self, torrent: Torrent, fingerprint: bytes, results: bytearray):
+        self.torrent = torrent
+        self.fingerprint = fingerprint
+        self.results = results
+        self._saved_at = time.monotonic()
+
+    def maybe_save(self):
+        if time.monotonic() - self._saved_at >= _CHECKPOINT_SECONDS:
+            self.save()
+
+    def save(self):
+        _save_bitfield(self.torrent, self.fingerprint, self.results)
+        self._saved_at = time.monotonic()
+
+
+def load_result(torrent: Torrent, data_dir: Path) -> bytearray | None:
+    """
+    Returns the saved piece results of ``torrent``, in the same form as
+    ``VerifyReport.piece_results``, or None if there are none or the data in
+    ``data_dir`` has changed since they were saved.
+    """
+    try:
+        saved = _result_path(torrent).read_bytes()
+    except FileNotFoundError:
+        return None
+
+    header_length = len(_RESULT_MAGIC) + hashlib.sha1().digest_size
+    piece_count = len(torrent.pieces)
+    if (
+        saved[: len(_RESULT_MAGIC)] != _RESULT_MAGIC
+        or len(saved) != header_length + (piece_count + 7) // 8
+        or saved[len(_RESULT_MAGIC) : header_length]
+        != data_fingerprint(torrent, data_dir)
+    ):
+        return None
+
+    bitfield = saved[header_length:]
+    bits = bin(int.from_bytes(bitfield, "big"))[2:].zfill(len(bitfield) * 8)
+    return bytearray(bits[:piece_count].encode().translate(_ASCII_TO_BITS))
+
+
+def data_verified(
+    torrent: Torrent, data_dir: Path, workers: int | None = None
+) -> bool:
+    """
+    Returns whether all of the data of ``torrent`` in ``data_dir`` is valid.
+
+    A previous passing result is trusted if the data has not changed since. Otherwise,
+    the data is verified now, resuming any earlier run, and the result saved.
+    """
+    return verify_torrent(torrent, data_dir, workers=workers).passed
@@ -0,0 +1,215 @@
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+from pathlib import Path
+import threading
+from urllib.parse import parse_qs
+
+import pytest
+
+from sb.cache import InventoryCache, SessionCache
+from sb.client import QBittorrentClient, TorrentUpload
+
+TORRENT_HASH = "c15e4ca57a767df5cdda3866f43d224925a2a16a"
+
+
+class FakeQBittorrent(ThreadingHTTPServer):
+    """Just enough of the qBittorrent WebUI API to log in and list torrents."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.requests: list[str] = []
+        self.rids: list[int] = []
+        self.sessions: set[str] = set()
+        self.torrents = {
+            TORRENT_HASH: {"name": "a", "category": "", "state": "stalledUP"}
+        }
+        # Whether every sync is a full update, as after the client restarts
+        self.full_updates = False
+        # The torrents that torrents/add adds, by the hash they are listed under
+        self.adds: dict[str, dict[str, str]] = {}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeQBittorrent
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.end_headers()
+
+    def do_GET(self):
+        self.do_POST()
+
+    def do_POST(self):
+        path, _, query = self.path.partition("?")
+        path = path.removeprefix("/api/v2/")
+        self.server.requests.append(path)
+        if length := int(self.headers.get("Content-Length") or 0):
+            query += "&" + self.rfile.read(length).decode(errors="replace")
+        params = {key: values[0] for key, values in parse_qs(query).items()}
+
+        if path == "auth/login":
+            sid = f"sid{len(self.server.sessions)}"
+            self.server.sessions.add(sid)
+            self._reply(b"Ok.", cookie=sid)
+            return
+
+        cookie = self.headers.get("Cookie") or ""
+        sids = {part.strip().removeprefix("SID=") for part in cookie.split(";")}
+        if not sids & self.server.sessions:
+            self.send_response(403)
+            self.send_header("Content-Length", "9")
+            self.end_headers()
+            self.wfile.write(b"Forbidden")
+            return
+
+        if path == "auth/logout":
+            self.server.sessions -= sids
+            self._reply(b"")
+        elif path == "sync/maindata":
+            rid = int(params.get("rid", 0))
+            self.server.rids.append(rid)
+            maindata = {"rid": rid + 1}
+            if rid == 0 or self.server.full_updates:
+                maindata |= {"full_update": True, "torrents": self.server.torrents}
+            self._reply(json.dumps(maindata).encode())
+        elif path == "app/preferences":
+            self._reply(b"{}")
+        elif path == "app/version":
+            self._reply(b"v5.0.0")
+        elif path == "app/webapiVersion":
+            self._reply(b"2.11.0")
+        elif path == "torrents/info":
+            hashes = params["hashes"].split("|") if "hashes" in params else None
+            torrents = [
+                {"hash": torrent_hash, **torrent}
+                for torrent_hash, torrent in self.server.torrents.items()
+                if hashes is None or torrent_hash in hashes
+            ]
+            self._reply(json.dumps(torrents).encode())
+        elif path == "torrents/add":
+            self.server.torrents |= self.server.adds
+            self._reply(b"Ok.")
+        else:
+            self._reply(b"[]")
+
+    def _reply(self, body: bytes, cookie: str | None = None):
+        self.send_response(200)
+        if cookie is not None:
+            self.send_header("Set-Cookie", f"SID={cookie}; HttpOnly; path=/")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server() -> Iterator[FakeQBittorrent]:
+    server = FakeQBittorrent()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def _client(server: FakeQBittorrent, tmp_path: Path) -> QBittorrentClient:
+    return QBittorrentClient(
+        host=server.url,
+        username="admin",
+        password="adminadmin",
+        sessions=SessionCache(tmp_path / "sessions"),
+        inventory=InventoryCache(tmp_path / "inventory.sqlite3"),
+    )
+
+
+def test_second_run_reuses_cached_session(server: FakeQBittorrent, tmp_path: Path):
+    with _client(server, tmp_path) as client:
+        client.list_torrents()
+    assert server.requests.count("auth/login") == 1
+
+    server.requests.clear()
+    with _client(server, tmp_path) as client:
+        client.list_torrents()
+    assert "auth/login" not in server.requests
+
+
+def test_rejected_session_logs_in_again(server: FakeQBittorrent, tmp_path: Path):
+    with _client(server, tmp_path) as client:
+        client.list_torrents()
+    # The client forgets the session, as when qBittorrent restarts
+    server.sessions.clear()
+
+    server.requests.clear()
+    with _client(server, tmp_path) as client:
+        client.list_torrents()
+    assert server.requests.count("auth/login") == 1
+
+    server.requests.clear()
+    with _client(server, tmp_path) as client:
+        client.list_torrents()
+    assert "auth/login" not in server.requests
+
+
+def test_second_run_syncs_only_changes(server: FakeQBittorrent, tmp_path: Path):
+    with _client(server, tmp_path) as client:
+        client.list_torrents()
+    assert server.rids == [0]
+    assert server.requests.count("app/preferences") == 1
+
+    server.requests.clear()
+    with _client(server, tmp_path) as client:
+        client.list_torrents()
+    assert server.rids == [0, 1]
+    assert "app/preferences" not in server.requests
+
+
+def test_full_update_reuses_cached_preferences(
+    server: FakeQBittorrent, tmp_path: Path
+):
+    with _client(server, tmp_path) as client:
+        client.list_torrents()
+
+    server.full_updates = True
+    server.requests.clear()
+    with _client(server, tmp_path) as client:
+        assert [t.hash for t in client.list_torrents()] == [TORRENT_HASH]
+    assert "app/preferences" not in server.requests
+
+
+def test_hash_lookup_ignores_case(server: FakeQBittorrent, tmp_path: Path):
+    with _client(server, tmp_path) as client:
+        torrents = client.list_torrents(hashes=[TORRENT_HASH.upper()])
+    assert [t.hash for t in torrents] == [TORRENT_HASH]
+
+
+def test_hybrid_added_under_v1_hash(server: FakeQBittorrent, tmp_path: Path):
+    v1 = "a" * 40
+    v2 = "b" * 64
+    # Clients on libtorrent 1.2 list hybrids by their v1 hash
+    server.full_updates = True
+    server.adds = {v1: {"name": "hybrid", "category": "", "state": "pausedDL"}}
+    upload = TorrentUpload(v2[:40], b"d4:infode", hashes=frozenset({v1, v2}))
+    with _client(server, tmp_path) as client:
+        added = client.add_paused_torrents([upload], category="")
+    assert added == {v2[:40]: v1}
+
+
+def test_hash_lookup_without_inventory_is_chunked(
+    server: FakeQBittorrent, tmp_path: Path
+):
+    hashes = [f"{i:040x}" for i in range(5)]
+    server.torrents = {
+        h: {"name": h, "category": "", "state": "pausedUP"} for h in hashes
+    }
+    with _client(server, tmp_path) as client:
+        client.inventory = None
+        client.hash_chunk_size = 2
+        torrents = client.list_torrents(hashes=hashes)
+    assert sorted(t.hash for t in torrents) == hashes
+    assert server.requests.count("torrents/info") == 3
@@ -0,0 +1,32 @@
+import pytest
+
+from sb.torrent import Torrent
+
+
+def _multi_file_torrent(files: bytes) -> Torrent:
+    info = b"d5:files" + files + b"4:name1:a12:piece lengthi16384e6:pieces0:e"
+    return Torrent.from_bytes(b"d4:info" + info + b"e")
+
+
+def test_files_are_read():
+    torrent = _multi_file_torrent(b"ld6:lengthi3e4:pathl1:beee")
+    assert [f.length for f in torrent.files] == [3]
+
+
+@pytest.mark.parametrize(
+    "files",
+    [
+        b"i1e",
+        b"li1ee",
+        b"ld4:pathl1:beee",
+        b"ld6:lengthi3eee",
+        b"ld6:length1:34:pathl1:beee",
+        b"ld6:lengthi-1e4:pathl1:beee",
+        b"ld6:lengthi18446744073709551616e4:pathl1:beee",
+        b"ld6:lengthi3e4:pathli5eeee",
+        b"ld6:lengthi3e4:path1:bee",
+    ],
+)
+def test_malformed_files_are_invalid(files: bytes):
+    with pytest.raises(ValueError, match="Invalid torrent file"):
+        _multi_file_torrent(files).files
@@ -0,0 +1,23 @@
+from pathlib import Path
+
+from sb.create import create_torrent
+from sb.verify import verify_torrent
+
+
+def test_sampled_files_are_not_reported_as_passed(tmp_path: Path):
+    data = tmp_path / "data"
+    data.mkdir()
+    (data / "a").write_bytes(bytes(16384 * 4))
+    (data / "b").write_bytes(bytes(16384))
+    (data / "c").write_bytes(bytes(16384))
+    torrent = create_torrent(
+        data, tmp_path / "data.torrent", version="v1", piece_length=16384
+    )
+
+    report = verify_torrent(torrent, tmp_path, pieces=[0, 3, 4])
+    assert [f["status"] for f in report.to_dict()["files"]] == [
+        "sampled",
+        "pass",
+        "unchecked",
+    ]
+    assert report.passed